@@ -0,0 +1,726 @@
+"""Benchmarks for the worklog database code
+
+Run with:
+
+    python3 benchmark.py suite --sizes 10000 1000000 --output results.json
+    python3 benchmark.py compare old.json new.json
+    python3 benchmark.py lists
+    python3 benchmark.py records
+    python3 benchmark.py startup
+    python3 benchmark.py pragmas
+    python3 benchmark.py stress
+    python3 benchmark.py http
+"""
+
+from datetime import date, timedelta
+from time import perf_counter
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+import urllib.parse
+
+from peewee import chunked
+from worklog import PRAGMA_PROFILES, REPORT_PAGE_SIZE, Worklog
+
+WORKLOG_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "worklog.py")
+
+EMPLOYEES = ["Alex", "Bob", "Chris", "Dana", "Eli", "Frankie", "Gene", "Hal"]
+
+# Generated employees are a first name and a last initial, ordered
+# from the busiest employee to the least busy.
+GENERATED_EMPLOYEES = [
+    "{} {}.".format(first_name, initial)
+    for initial in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    for first_name in EMPLOYEES]
+
+TASK_VERBS = ["Updated", "Fixed", "Reviewed", "Wrote", "Tested", "Deployed",
+              "Planned", "Refactored", "Documented", "Investigated"]
+TASK_SUBJECTS = ["database", "login page", "reports", "release notes",
+                 "search", "billing job", "test suite", "API", "dashboard",
+                 "backups", "onboarding docs", "timesheets"]
+NOTE_WORDS = ["waiting", "on", "review", "from", "the", "team", "follow",
+              "up", "tomorrow", "blocked", "by", "deploy", "needs", "more",
+              "tests", "customer", "asked", "for", "changes", "done"]
+COMMON_MINUTES = [15, 30, 45, 60, 90, 120, 180, 240, 480]
+
+# Years of history the generated tasks are spread over.
+GENERATED_YEARS = 5
+
+# Row counts that are generated and inserted at a time.
+GENERATE_CHUNK_SIZE = 50000
+
+
+def generate_tasks(row_count, seed=0):
+    """Yield row_count realistic task rows.
+
+    A few employees log most of the tasks (a Zipf-like
+    distribution), dates cover GENERATED_YEARS years of weekdays,
+    minutes cluster on round numbers and notes are empty, a short
+    sentence or, now and then, a pasted log several KB long.
+    """
+
+    randomizer = random.Random(seed)
+    weights = [1 / rank ** 1.1
+               for rank in range(1, len(GENERATED_EMPLOYEES) + 1)]
+    first_day = date(2014, 1, 1)
+    day_count = GENERATED_YEARS * 365
+
+    while row_count > 0:
+        batch = min(row_count, GENERATE_CHUNK_SIZE)
+        employees = iter(randomizer.choices(
+            GENERATED_EMPLOYEES, weights, k=batch))
+
+        for row_number in range(batch):
+            day = first_day + timedelta(days=randomizer.randrange(day_count))
+            if day.weekday() > 4:
+                day -= timedelta(days=day.weekday() - 4)
+
+            note_kind = randomizer.random()
+            if note_kind < 0.3:
+                notes = ""
+            elif note_kind < 0.98:
+                notes = " ".join(randomizer.choices(
+                    NOTE_WORDS, k=randomizer.randint(3, 25)))
+            else:
+                notes = "\n".join(
+                    "INFO line {} {}".format(line, " ".join(
+                        randomizer.choices(NOTE_WORDS, k=8)))
+                    for line in range(randomizer.randint(40, 160)))
+
+            if randomizer.random() < 0.8:
+                minutes = randomizer.choice(COMMON_MINUTES)
+            else:
+                minutes = randomizer.randint(1, 480)
+
+            yield {
+                "employee": next(employees),
+                "task": "{} {}".format(randomizer.choice(TASK_VERBS),
+                                       randomizer.choice(TASK_SUBJECTS)),
+                "minutes": minutes,
+                "notes": notes,
+                "date": day
+            }
+
+        row_count -= batch
+
+
+def build_worklog(row_count, database_name=":memory:", compact=False):
+    """Return a Worklog connected to a database (in memory unless
+    a file name is given) that has been loaded with row_count
+    generated tasks, using compact storage if compact is set.
+    """
+
+    wl = Worklog(database_name)
+    wl.build_database_tables()
+    if compact:
+        wl.convert_to_compact_storage()
+
+    for rows in chunked(generate_tasks(row_count, seed=row_count),
+                        GENERATE_CHUNK_SIZE):
+        wl.insert_rows(rows)
+
+    return wl
+
+
+def measure(method):
+    """Call method and return its latency in milliseconds
+    and the peak memory it allocated in kilobytes.
+    """
+
+    tracemalloc.start()
+    start = perf_counter()
+    method()
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed * 1000, peak / 1024
+
+
+def time_calls(method, repeat):
+    """Return the median latency of calling method, in milliseconds."""
+
+    timings = []
+    for attempt in range(repeat):
+        start = perf_counter()
+        method()
+        timings.append((perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+def run_suite(wl, repeat):
+    """Time the Worklog methods against a loaded work log. Returns
+    a dict of median milliseconds per call, keyed by method.
+    """
+
+    results = {}
+    results["get_total_number_of_tasks"] = time_calls(
+        wl.get_total_number_of_tasks, repeat)
+
+    for name in ["get_list_of_dates",
+                 "get_list_of_employees",
+                 "get_list_of_times"]:
+        results[name] = time_calls(getattr(wl, name), repeat)
+
+    # The lookups fetch one page, the way the report shows them.
+    page = REPORT_PAGE_SIZE + 1
+    for name in ["get_tasks_for_date",
+                 "get_tasks_for_employee",
+                 "get_tasks_for_time"]:
+        results[name] = time_calls(
+            lambda: getattr(wl, name)("1", limit=page), repeat)
+
+    results["get_tasks_between"] = time_calls(
+        lambda: wl.get_tasks_between("2016-01-01", "2016-03-31", limit=page),
+        repeat)
+    results["get_tasks_by_search"] = time_calls(
+        lambda: wl.get_tasks_by_search('"release notes" blocked'), repeat)
+    results["get_minutes_totals"] = time_calls(
+        lambda: wl.get_minutes_totals(
+            "month", start="2016-01-01", end="2016-03-31"), repeat)
+
+    new_tasks = iter(generate_tasks(repeat, seed=-1))
+    results["add_task"] = time_calls(
+        lambda: wl.add_task(next(new_tasks)), repeat)
+
+    return results
+
+
+def benchmark_suite(sizes, repeat, output_name):
+    """Run the suite on a database file loaded with each number of
+    generated tasks, print the timings and save them as JSON.
+    """
+
+    results = {"sizes": {}}
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            start = perf_counter()
+            wl = build_worklog(size, os.path.join(directory, "suite.db"))
+            print("Generated {} tasks in {:.1f} seconds.".format(
+                size, perf_counter() - start))
+            timings = run_suite(wl, repeat)
+            wl.db.close()
+
+        results["sizes"][str(size)] = timings
+        for name, milliseconds in sorted(timings.items()):
+            print("{:>10}  {:<28}{:>10.2f} ms".format(
+                size, name, milliseconds))
+
+    if output_name:
+        with open(output_name, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+def compare_results(old_name, new_name, threshold):
+    """Compare two saved suite results. Returns False if anything
+    got slower by more than threshold (e.g. 0.2 for 20%).
+    """
+
+    with open(old_name) as old_file:
+        old_results = json.load(old_file)["sizes"]
+    with open(new_name) as new_file:
+        new_results = json.load(new_file)["sizes"]
+
+    regressions = 0
+    print("{:>10}  {:<28}{:>10}{:>10}{:>9}".format(
+        "rows", "method", "old ms", "new ms", "change"))
+
+    for size in sorted(set(old_results) & set(new_results), key=int):
+        old_timings = old_results[size]
+        new_timings = new_results[size]
+        for name in sorted(set(old_timings) & set(new_timings)):
+            change = (new_timings[name] - old_timings[name]) / max(
+                old_timings[name], 0.001)
+            marker = ""
+            if change > threshold:
+                marker = "  REGRESSION"
+                regressions += 1
+            print("{:>10}  {:<28}{:>10.2f}{:>10.2f}{:>+9.0%}{}".format(
+                size, name, old_timings[name], new_timings[name],
+                change, marker))
+
+    return regressions == 0
+
+
+def benchmark_lists(sizes):
+    """Time the get_list_of_* menu methods as the table grows."""
+
+    print("{:>10}  {:<22}{:>12}{:>12}".format(
+        "rows", "method", "ms", "peak KB"))
+
+    for size in sizes:
+        wl = build_worklog(size)
+        for name in ["get_list_of_dates",
+                     "get_list_of_employees",
+                     "get_list_of_times"]:
+            latency, peak = measure(getattr(wl, name))
+            print("{:>10}  {:<22}{:>12.2f}{:>12.1f}".format(
+                size, name, latency, peak))
+        wl.db.close()
+
+
+def model_dicts(wl):
+    """Build one dict per task from model instances, the way
+    the lookups used to. Used as the baseline for the records
+    benchmark.
+    """
+
+    query = wl.tasks_query().select(wl.Task, wl.Employee)
+    return [{"task": task_item.task,
+             "employee": task_item.employee.name,
+             "minutes": task_item.minutes,
+             "date": task_item.date,
+             "notes": task_item.notes} for task_item in query]
+
+
+def benchmark_records(sizes):
+    """Compare the memory held by a full result set of TaskRecords
+    with the same result set built as dicts from model instances.
+    """
+
+    print("{:>10}  {:<22}{:>12}{:>12}".format(
+        "rows", "result type", "ms", "peak KB"))
+
+    for size in sizes:
+        wl = build_worklog(size)
+        for name, method in [
+                ("model dicts", lambda: model_dicts(wl)),
+                ("TaskRecord", lambda: wl.get_tasks_from_query(
+                    wl.tasks_query()))]:
+            latency, peak = measure(method)
+            print("{:>10}  {:<22}{:>12.2f}{:>12.1f}".format(
+                size, name, latency, peak))
+        wl.db.close()
+
+
+def benchmark_pragmas(inserts, lookups):
+    """Compare add_task and lookup throughput on a database file
+    for each of the PRAGMA_PROFILES.
+    """
+
+    print("{:<8}{:>16}{:>16}".format("profile", "inserts/sec", "lookups/sec"))
+
+    for profile in sorted(PRAGMA_PROFILES):
+        with tempfile.TemporaryDirectory() as directory:
+            wl = Worklog()
+            wl.connect_to_database(
+                os.path.join(directory, "benchmark.db"), profile)
+            wl.build_database_tables()
+
+            start = perf_counter()
+            for row_number in range(inserts):
+                wl.add_task({
+                    "employee": EMPLOYEES[row_number % len(EMPLOYEES)],
+                    "task": "Task {}".format(row_number),
+                    "minutes": row_number % 480 + 1,
+                    "notes": "",
+                    "date": date(2014, 1, 1) + timedelta(
+                        days=row_number % 1460)
+                })
+            insert_rate = inserts / (perf_counter() - start)
+
+            start = perf_counter()
+            for lookup_number in range(lookups):
+                wl.get_tasks_for_employee(
+                    lookup_number % len(EMPLOYEES) + 1, limit=50)
+            lookup_rate = lookups / (perf_counter() - start)
+
+            wl.db.close()
+
+        print("{:<8}{:>16.0f}{:>16.0f}".format(
+            profile, insert_rate, lookup_rate))
+
+
+def benchmark_buffered(inserts, max_rows):
+    """Compare add_task throughput on a database file with each task
+    in its own transaction and with the write buffer.
+    """
+
+    print("{:<10}{:>16}".format("writes", "inserts/sec"))
+
+    for buffered in [False, True]:
+        with tempfile.TemporaryDirectory() as directory:
+            wl = Worklog(os.path.join(directory, "benchmark.db"))
+            wl.build_database_tables()
+            if buffered:
+                wl.enable_write_buffer(max_rows=max_rows)
+
+            start = perf_counter()
+            for row_number in range(inserts):
+                wl.add_task({
+                    "employee": EMPLOYEES[row_number % len(EMPLOYEES)],
+                    "task": "Task {}".format(row_number),
+                    "minutes": row_number % 480 + 1,
+                    "notes": "",
+                    "date": date(2014, 1, 1) + timedelta(
+                        days=row_number % 1460)
+                })
+            wl.flush_writes()
+            insert_rate = inserts / (perf_counter() - start)
+
+            assert wl.get_total_number_of_tasks() == inserts
+            wl.db.close()
+
+        print("{:<10}{:>16.0f}".format(
+            "buffered" if buffered else "direct", insert_rate))
+
+
+def benchmark_compact(rows, lookups):
+    """Compare the file size, insert rate and lookup rates of a
+    generated database with the standard and compact storage.
+    """
+
+    print("{:<10}{:>12}{:>14}{:>16}{:>16}".format(
+        "storage", "size KB", "inserts/sec", "lookups/sec", "searches/sec"))
+
+    for compact in [False, True]:
+        with tempfile.TemporaryDirectory() as directory:
+            database_name = os.path.join(directory, "benchmark.db")
+
+            start = perf_counter()
+            wl = build_worklog(rows, database_name, compact)
+            insert_rate = rows / (perf_counter() - start)
+            wl.db.execute_sql("VACUUM")
+            wl.db.execute_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            size = os.path.getsize(database_name) / 1024
+
+            wl.get_list_of_employees()
+            first_day = date(2014, 1, 1)
+            start = perf_counter()
+            for lookup_number in range(lookups):
+                month_start = first_day + timedelta(
+                    days=lookup_number * 7 % (GENERATED_YEARS * 365))
+                wl.get_tasks_between(
+                    month_start, month_start + timedelta(days=30), limit=50)
+                wl.get_tasks_for_employee(lookup_number % 10 + 1, limit=50)
+            lookup_rate = lookups * 2 / (perf_counter() - start)
+
+            start = perf_counter()
+            for lookup_number in range(lookups):
+                wl.get_page_of_tasks(wl.search_tasks_query(
+                    TASK_SUBJECTS[lookup_number % len(TASK_SUBJECTS)]),
+                    limit=50)
+            search_rate = lookups / (perf_counter() - start)
+
+            wl.db.close()
+
+        print("{:<10}{:>12.0f}{:>14.0f}{:>16.0f}{:>16.0f}".format(
+            "compact" if compact else "standard", size, insert_rate,
+            lookup_rate, search_rate))
+
+
+def stress_writer(database_name, seconds, results):
+    """Add tasks to a database file for a number of seconds and
+    put the (writes, errors) counts on the results queue.
+    """
+
+    wl = Worklog(database_name)
+    writes = 0
+    errors = 0
+    stop_time = perf_counter() + seconds
+
+    while perf_counter() < stop_time:
+        try:
+            wl.add_task({
+                "employee": EMPLOYEES[writes % len(EMPLOYEES)],
+                "task": "Stress task {}".format(writes),
+                "minutes": writes % 480 + 1,
+                "notes": "",
+                "date": date(2014, 1, 1) + timedelta(days=writes % 1460)
+            })
+            writes += 1
+        except Exception:
+            errors += 1
+
+    wl.db.close()
+    results.put((writes, errors))
+
+
+def stress_reader(wl, seconds, results):
+    """Run lookups from a thread for a number of seconds and
+    append the (reads, errors) counts to the results list.
+    """
+
+    reads = 0
+    errors = 0
+    stop_time = perf_counter() + seconds
+
+    while perf_counter() < stop_time:
+        try:
+            wl.get_page_of_tasks(
+                wl.tasks_query(employee=EMPLOYEES[reads % len(EMPLOYEES)]),
+                limit=20)
+            wl.get_minutes_totals(start="2016-01-01")
+            wl.get_total_number_of_tasks()
+            reads += 1
+        except Exception:
+            errors += 1
+
+    wl.db.close()
+    results.append((reads, errors))
+
+
+def benchmark_stress(writers, readers, seconds):
+    """Hammer one database file with writer processes and reader
+    threads at the same time. Returns False if any operation
+    failed, e.g. with "database is locked".
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "stress.db")
+        wl = Worklog(database_name)
+        wl.build_database_tables()
+
+        write_results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=stress_writer,
+                args=(database_name, seconds, write_results))
+            for writer in range(writers)]
+        read_results = []
+        threads = [
+            threading.Thread(
+                target=stress_reader, args=(wl, seconds, read_results))
+            for reader in range(readers)]
+
+        for worker in processes + threads:
+            worker.start()
+        writes = [write_results.get() for process in processes]
+        for worker in processes + threads:
+            worker.join()
+
+        wl.db.close()
+
+    write_count = sum(count for count, errors in writes)
+    write_errors = sum(errors for count, errors in writes)
+    read_count = sum(count for count, errors in read_results)
+    read_errors = sum(errors for count, errors in read_results)
+
+    print("{} writer processes: {} writes ({:.0f}/sec), {} errors".format(
+        writers, write_count, write_count / seconds, write_errors))
+    print("{} reader threads: {} reads ({:.0f}/sec), {} errors".format(
+        readers, read_count, read_count / seconds, read_errors))
+
+    return write_errors == 0 and read_errors == 0
+
+
+HTTP_REQUESTS = [
+    "/employees",
+    "/tasks?employee={}&start=2016-01-01&end=2016-01-31".format(
+        urllib.parse.quote(GENERATED_EMPLOYEES[0])),
+    "/search?q=release*",
+    "/totals?period=month&start=2016-01-01&end=2016-03-31"
+]
+
+
+def http_client(host, port, requests, latencies):
+    """Send requests over one keep-alive connection and append
+    each request's latency in milliseconds to latencies.
+    """
+
+    connection = http.client.HTTPConnection(host, port)
+
+    for request_number in range(requests):
+        path = HTTP_REQUESTS[request_number % len(HTTP_REQUESTS)]
+        start = perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError("{} returned {}".format(path, response.status))
+        latencies.append((perf_counter() - start) * 1000)
+
+    connection.close()
+
+
+def benchmark_http(rows, clients, requests):
+    """Load test the JSON service. A server is started in its own
+    process on a generated database and the clients cycle through
+    HTTP_REQUESTS. Prints the requests per second and latency
+    percentiles.
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "http.db")
+        build_worklog(rows, database_name).db.close()
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        server = subprocess.Popen(
+            [sys.executable, WORKLOG_SCRIPT, "--database", database_name,
+             "serve", "--port", str(port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        try:
+            for attempt in range(100):
+                try:
+                    socket.create_connection(("127.0.0.1", port)).close()
+                    break
+                except OSError:
+                    threading.Event().wait(0.1)
+
+            latencies = []
+            threads = [
+                threading.Thread(
+                    target=http_client,
+                    args=("127.0.0.1", port, requests, latencies))
+                for client in range(clients)]
+
+            start = perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print("{} clients, {} requests in {:.2f} seconds: {:.0f} requests/sec"
+          .format(clients, len(latencies), elapsed,
+                  len(latencies) / elapsed))
+    print("latency: p50 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.99)],
+        latencies[-1]))
+
+
+def benchmark_startup(runs, max_ms):
+    """Time launching the interactive work log and quitting from
+    the main menu. Returns False if the median is over max_ms.
+    """
+
+    timings = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            start = perf_counter()
+            subprocess.run(
+                [sys.executable, WORKLOG_SCRIPT], input=b"4\n",
+                cwd=directory, stdout=subprocess.DEVNULL,
+                env=dict(os.environ, TERM="dumb"), check=True)
+            timings.append((perf_counter() - start) * 1000)
+
+    median = statistics.median(timings)
+    print("startup over {} runs: median {:.1f} ms, max {:.1f} ms".format(
+        runs, median, max(timings)))
+
+    if max_ms is not None and median > max_ms:
+        print("Startup is over the {:.1f} ms limit.".format(max_ms))
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark")
+    subparsers.required = True
+
+    suite_parser = subparsers.add_parser(
+        "suite", help="time the Worklog methods on generated data")
+    suite_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    suite_parser.add_argument(
+        "--repeat", type=int, default=20,
+        help="calls per method; the median is reported")
+    suite_parser.add_argument(
+        "--output", help="save the results to this JSON file")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare two saved suite results")
+    compare_parser.add_argument("old_results")
+    compare_parser.add_argument("new_results")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="slowdown that counts as a regression (default: 0.2)")
+
+    lists_parser = subparsers.add_parser(
+        "lists", help="distinct employee/date/minutes menu lists")
+    lists_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+
+    records_parser = subparsers.add_parser(
+        "records", help="memory used by full lookup result sets")
+    records_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 1000000])
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="time from launch to quitting the main menu")
+    startup_parser.add_argument("--runs", type=int, default=10)
+    startup_parser.add_argument(
+        "--max-ms", type=float,
+        help="exit with an error if the median startup is slower")
+
+    pragmas_parser = subparsers.add_parser(
+        "pragmas", help="insert and lookup throughput for each SQLite profile")
+    pragmas_parser.add_argument("--inserts", type=int, default=2000)
+    pragmas_parser.add_argument("--lookups", type=int, default=2000)
+
+    buffered_parser = subparsers.add_parser(
+        "buffered", help="add_task throughput with and without buffering")
+    buffered_parser.add_argument("--inserts", type=int, default=5000)
+    buffered_parser.add_argument("--max-rows", type=int, default=500)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="file size and throughput with compact storage")
+    compact_parser.add_argument("--rows", type=int, default=200000)
+    compact_parser.add_argument("--lookups", type=int, default=500)
+
+    stress_parser = subparsers.add_parser(
+        "stress", help="concurrent writer processes and reader threads")
+    stress_parser.add_argument("--writers", type=int, default=4)
+    stress_parser.add_argument("--readers", type=int, default=4)
+    stress_parser.add_argument("--seconds", type=float, default=5)
+
+    http_parser = subparsers.add_parser(
+        "http", help="load test the JSON service from worklog.py serve")
+    http_parser.add_argument("--rows", type=int, default=100000)
+    http_parser.add_argument("--clients", type=int, default=8)
+    http_parser.add_argument(
+        "--requests", type=int, default=200, help="requests per client")
+
+    arguments = parser.parse_args()
+
+    if arguments.benchmark == "suite":
+        benchmark_suite(arguments.sizes, arguments.repeat, arguments.output)
+    elif arguments.benchmark == "compare":
+        if not compare_results(arguments.old_results, arguments.new_results,
+                               arguments.threshold):
+            sys.exit(1)
+    elif arguments.benchmark == "lists":
+        benchmark_lists(arguments.sizes)
+    elif arguments.benchmark == "records":
+        benchmark_records(arguments.sizes)
+    elif arguments.benchmark == "pragmas":
+        benchmark_pragmas(arguments.inserts, arguments.lookups)
+    elif arguments.benchmark == "buffered":
+        benchmark_buffered(arguments.inserts, arguments.max_rows)
+    elif arguments.benchmark == "compact":
+        benchmark_compact(arguments.rows, arguments.lookups)
+    elif arguments.benchmark == "stress":
+        if not benchmark_stress(
+                arguments.writers, arguments.readers, arguments.seconds):
+            sys.exit(1)
+    elif arguments.benchmark == "http":
+        benchmark_http(arguments.rows, arguments.clients, arguments.requests)
+    elif arguments.benchmark == "startup":
+        if not benchmark_startup(arguments.runs, arguments.max_ms):
+            sys.exit(1)
@@ -1,30 +1,530 @@
 """Worklog with a database back end
 """
 
+from collections import OrderedDict, namedtuple
+from functools import partial
 from peewee import *
-from time import gmtime, strftime
+from playhouse.sqlite_ext import FTS5Model, SearchField
+from time import gmtime, perf_counter, sleep, strftime
+from weakref import WeakKeyDictionary
 
+import datetime
 import re
 import os
+import shutil
+import sys
+import threading
+import zlib
 
 database_connection = SqliteDatabase(None)
 
+# How many times work logs have changed the tasks in each database.
+# Work logs that share a database (e.g. the module's connection)
+# share the count, so their query caches see each other's changes.
+database_generations = WeakKeyDictionary()
+
+# SQLite settings applied to every connection. "tuned" is the
+# default: a write-ahead log so readers don't block the writer,
+# NORMAL syncing (safe with WAL, only the last commits can be lost
+# on power failure), a 64MB page cache, 256MB of memory mapped I/O,
+# temp tables in memory and a 5 second wait on a locked database.
+# "stock" leaves SQLite's own defaults alone.
+PRAGMA_PROFILES = {
+    "tuned": {
+        "busy_timeout": 5000,
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -64 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "memory"
+    },
+    "stock": {}
+}
+
+# How many times a write that finds the database locked is tried,
+# and how long to wait before the first retry. The wait doubles
+# after each attempt.
+WRITE_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.05
+
+# Number of worker threads, and so SQLite connections, an
+# AsyncWorklog runs its queries on.
+ASYNC_WORKERS = 4
+
+# Connections kept by the pool a served work log uses, and how many
+# seconds a request waits for a free one.
+SERVER_POOL_SIZE = 16
+SERVER_POOL_WAIT = 10
+
+# Responses are streamed in chunks of about this many bytes.
+SERVER_CHUNK_SIZE = 64 * 1024
+
+# With buffered writes, add_task commits the pending tasks in one
+# transaction once this many are waiting, or once the oldest has
+# waited this many seconds.
+WRITE_BUFFER_ROWS = 500
+WRITE_BUFFER_SECONDS = 1.0
+
+# The schema name the archive database is attached as, the file
+# the archive command uses by default and how many tasks it moves
+# per transaction.
+ARCHIVE_SCHEMA = "archive"
+ARCHIVE_DATABASE = "archive.db"
+ARCHIVE_BATCH_ROWS = 500
+
+# How many tasks are copied per transaction when an older
+# database is migrated to the employee table.
+MIGRATION_BATCH_ROWS = 5000
+
+# With compact storage, notes longer than this many bytes are kept
+# zlib-compressed, and dates are kept as Julian day numbers, which
+# is date.toordinal() plus this offset.
+NOTES_COMPRESS_BYTES = 512
+JULIAN_DAY_OFFSET = 1721425
+
+# The SQL function that decompresses notes in queries and triggers.
+NOTES_FUNCTION = "worklog_notes"
+
+# Queries slower than this many milliseconds are written to the
+# slow query log when instrumentation is turned on.
+SLOW_QUERY_MS = 100
+
+# The Worklog methods that instrumentation times.
+INSTRUMENTED_METHODS = [
+    "add_task", "add_tasks", "export_tasks", "get_distinct_values",
+    "get_list_of_dates", "get_list_of_employees", "get_list_of_times",
+    "get_minutes_totals", "get_page_of_tasks", "get_tasks_between",
+    "get_tasks_by_search", "get_tasks_for_date", "get_tasks_for_employee",
+    "get_tasks_for_time", "get_total_number_of_tasks", "import_tasks"
+]
+
+# The menu each get_list_of_* method stores its list for, so cached
+# lists are stored too.
+MENU_LIST_METHODS = {
+    "get_list_of_dates": "date",
+    "get_list_of_employees": "employee",
+    "get_list_of_times": "time"
+}
+
+# The lookups a read replica answers from its in-memory copy of
+# the database.
+REPLICA_METHODS = [
+    "export_tasks", "get_distinct_values", "get_list_of_dates",
+    "get_list_of_employees", "get_list_of_times", "get_minutes_totals",
+    "get_page_of_tasks", "get_tasks_between", "get_tasks_by_search",
+    "get_tasks_for_date", "get_tasks_for_employee", "get_tasks_for_time",
+    "get_tasks_from_query", "get_total_number_of_tasks",
+    "search_tasks_query", "tasks_query"
+]
+
+# How many lookup results the query cache keeps, and the lookups it
+# caches.
+QUERY_CACHE_SIZE = 128
+CACHED_METHODS = [
+    "get_list_of_dates", "get_list_of_employees", "get_list_of_times",
+    "get_minutes_totals", "get_tasks_between", "get_tasks_by_search",
+    "get_tasks_for_date", "get_tasks_for_employee", "get_tasks_for_time",
+    "get_total_number_of_tasks"
+]
+
+# Columns used by the import and export files, in file order.
+TASK_FILE_FIELDS = ["employee", "task", "minutes", "notes", "date"]
+
+# ANSI escape codes that clear the screen and move the cursor
+# to the top left corner.
+CLEAR_SCREEN = "\033[2J\033[H"
+
+# strftime formats for the periods that minutes can be totaled by.
+TOTALS_PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m"
+}
+
+# Number of tasks shown on each page of a report.
+REPORT_PAGE_SIZE = 10
+
+# SQLite builds before 3.32 allow 999 variables per statement,
+# which covers this many six column rows in one insert.
+ROWS_PER_INSERT = 150
+
+
+def decompress_notes(notes):
+    """Return notes that may have been stored compressed as text.
+
+    >>> decompress_notes(zlib.compress("Good stuff here".encode()))
+    'Good stuff here'
+    >>> decompress_notes("Good stuff here")
+    'Good stuff here'
+
+    """
+    if isinstance(notes, bytes):
+        return zlib.decompress(notes).decode("utf-8")
+    return notes
+
+
+class CompressedTextField(TextField):
+    """Text that's stored zlib-compressed, as a blob, if it's longer
+    than NOTES_COMPRESS_BYTES.
+    """
+
+    def db_value(self, value):
+        value = super().db_value(value)
+        if value is not None:
+            data = value.encode("utf-8")
+            if len(data) > NOTES_COMPRESS_BYTES:
+                return zlib.compress(data)
+        return value
+
+    def python_value(self, value):
+        return decompress_notes(value)
+
+
+class DayNumberField(DateField):
+    """A date that's stored as its Julian day number. The numbers
+    are small integers that sort and compare like the dates, and
+    SQLite's date functions read them as noon on that day.
+
+    >>> field = DayNumberField()
+    >>> field.db_value("2017-01-01")
+    2457755
+    >>> field.python_value(2457755)
+    datetime.date(2017, 1, 1)
+
+    """
+    field_type = "INTEGER"
+
+    def db_value(self, value):
+        if isinstance(value, str):
+            value = super().python_value(value)
+        if isinstance(value, datetime.date):
+            return value.toordinal() + JULIAN_DAY_OFFSET
+        return value
+
+    def python_value(self, value):
+        if isinstance(value, int):
+            return datetime.date.fromordinal(value - JULIAN_DAY_OFFSET)
+        return value
+
+
+class Employee(Model):
+    name = CharField(max_length=255, unique=True)
+
+    class Meta:
+        database = database_connection
+
 
 class Task(Model):
-    date = DateField()
-    employee = CharField(max_length=255)
-    minutes = IntegerField()
+    date = DateField(index=True)
+    employee = ForeignKeyField(Employee, column_name="employee_id")
+    minutes = IntegerField(index=True)
     notes = TextField()
     task = CharField(max_length=255)
 
     class Meta:
         database = database_connection
+        indexes = (
+            (("employee", "date"), False),
+            (("minutes", "date"), False),
+            (("date", "employee", "minutes"), False),
+        )
+
+
+class TaskRecord(namedtuple("TaskRecord", [
+        "id", "date", "employee", "minutes", "notes", "task"])):
+    """A task as it's returned by the lookups.
+
+    Records are plain tuples read straight from the database
+    cursor, so they're much smaller than model instances or
+    dicts. They can still be read like a dict (task["employee"])
+    as well as by attribute (task.employee).
+
+    >>> import datetime
+    >>> record = TaskRecord( \
+    1, datetime.date(2017, 1, 1), "Bob", 20, "", "Stuff")
+    >>> record["employee"]
+    'Bob'
+    >>> record.minutes
+    20
+    >>> record[0]
+    1
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return self._fields
+
+
+class TaskSearchIndex(FTS5Model):
+    """Full-text index over Task.task and Task.notes.
+
+    The index is an external content table that reads from
+    Task, and it's kept in sync by the triggers in
+    SEARCH_INDEX_TRIGGERS.
+    """
+    task = SearchField()
+    notes = SearchField()
 
+    class Meta:
+        database = database_connection
+        table_name = "task_search_index"
+        options = {"content": "task", "content_rowid": "id"}
+
+
+SEARCH_INDEX_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS task_search_index_insert
+    AFTER INSERT ON task BEGIN
+        INSERT INTO task_search_index (rowid, task, notes)
+        VALUES (new.id, new.task, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_index_delete
+    AFTER DELETE ON task BEGIN
+        INSERT INTO task_search_index (task_search_index, rowid, task, notes)
+        VALUES ('delete', old.id, old.task, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_search_index_update
+    AFTER UPDATE ON task BEGIN
+        INSERT INTO task_search_index (task_search_index, rowid, task, notes)
+        VALUES ('delete', old.id, old.task, old.notes);
+        INSERT INTO task_search_index (rowid, task, notes)
+        VALUES (new.id, new.task, new.notes);
+    END""",
+]
+
+
+class QueryCache:
+    """A least recently used cache of lookup results, with counts
+    of the hits and misses.
+
+    The cache is emptied when the database's generation changes,
+    which happens whenever a work log changes the tasks, and when the
+    data_version of the connection doing the lookup changes, which
+    happens when another connection (e.g. another process) commits
+    a change to the database. The first time a connection is seen
+    the cache is emptied too, since there's nothing to compare.
+
+    >>> cache = QueryCache(max_entries=2)
+    >>> connection = object()
+    >>> cache.check(0, connection, 1)
+    >>> cache.get("dates", lambda: ["2017-01-01"])
+    ['2017-01-01']
+    >>> cache.get("times", lambda: [20])
+    [20]
+    >>> cache.get("dates", lambda: [])
+    ['2017-01-01']
+    >>> cache.get("employees", lambda: ["Bob"])
+    ['Bob']
+    >>> cache.get("times", lambda: [30])
+    [30]
+    >>> cache.hits, cache.misses
+    (1, 4)
+    >>> cache.check(1, connection, 1)
+    >>> cache.get("times", lambda: [40])
+    [40]
+    >>> cache.check(1, connection, 2)
+    >>> len(cache.entries)
+    0
+
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generation = None
+        # The last data_version seen on each connection, keyed by
+        # id(connection). The connection is kept with it so the id
+        # can't be reused.
+        self.data_versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def check(self, generation, connection, data_version):
+        """Empty the cache if the work log or another connection
+        has changed the database since it was filled.
+        """
 
-class Worklog:
+        with self.lock:
+            seen = self.data_versions.get(id(connection))
+            if (generation != self.generation or seen is None or
+                    seen[1] != data_version):
+                self.entries.clear()
+                self.generation = generation
+                self.data_versions[id(connection)] = (
+                    connection, data_version)
+
+    def get(self, key, load):
+        """Return the cached value for key, or call load to get it
+        and cache it. Lists are copied so callers can't change the
+        cached ones.
+        """
+
+        with self.lock:
+            generation = self.generation
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                value = self.entries[key]
+                return list(value) if isinstance(value, list) else value
+            self.misses += 1
+
+        value = load()
+
+        with self.lock:
+            # A result read while the tasks changed isn't kept.
+            if self.generation == generation:
+                self.entries[key] = value
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        return list(value) if isinstance(value, list) else value
+
+
+class QueryStats:
+    """Call counts and latency histograms, kept per name.
+
+    >>> stats = QueryStats()
+    >>> stats.record("get_list_of_dates", 0.0004)
+    >>> stats.record("get_list_of_dates", 0.003)
+    >>> stats.record("sql", 0.2)
+    >>> print(stats.format_report(), end="")
+    name                       calls  total ms   max ms  histogram (ms)
+    get_list_of_dates              2       3.4      3.0  <=0.5:1 <=5:1
+    sql                            1     200.0    200.0  <=250:1
+
+    """
+
+    # Upper bounds of the histogram buckets, in milliseconds.
+    BUCKETS = [0.1, 0.5, 1, 5, 10, 50, 100, 250, 500, 1000, 5000]
 
     def __init__(self):
-        self.db = database_connection
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.totals = {}
+        self.maximums = {}
+        self.histograms = {}
+
+    def record(self, name, seconds):
+        milliseconds = seconds * 1000
+        bucket = len(self.BUCKETS)
+        for index, upper_bound in enumerate(self.BUCKETS):
+            if milliseconds <= upper_bound:
+                bucket = index
+                break
+
+        with self.lock:
+            if name not in self.counts:
+                self.counts[name] = 0
+                self.totals[name] = 0.0
+                self.maximums[name] = 0.0
+                self.histograms[name] = [0] * (len(self.BUCKETS) + 1)
+            self.counts[name] += 1
+            self.totals[name] += milliseconds
+            self.maximums[name] = max(self.maximums[name], milliseconds)
+            self.histograms[name][bucket] += 1
+
+    def format_report(self):
+        row_format = "{:<27}{:>5}{:>10}{:>9}  {}"
+        lines = [row_format.format(
+            "name", "calls", "total ms", "max ms", "histogram (ms)")]
+
+        with self.lock:
+            for name in sorted(self.counts):
+                buckets = []
+                for index, count in enumerate(self.histograms[name]):
+                    if count:
+                        if index < len(self.BUCKETS):
+                            label = "<={:g}".format(self.BUCKETS[index])
+                        else:
+                            label = ">{:g}".format(self.BUCKETS[-1])
+                        buckets.append("{}:{}".format(label, count))
+                lines.append(row_format.format(
+                    name, self.counts[name],
+                    "{:.1f}".format(self.totals[name]),
+                    "{:.1f}".format(self.maximums[name]),
+                    " ".join(buckets)))
+
+        return "\n".join(lines) + "\n"
+
+
+class Worklog:
+
+    def __init__(self, database_name=None, profile="tuned", pool_size=None):
+        """Set up a work log.
+
+        By default every Worklog shares the module's database
+        connection, which connect_to_database points at a file.
+        Passing database_name gives the Worklog its own database
+        and models instead, connected right away, so work logs for
+        different files can be used side by side.
+
+        Either way peewee keeps a separate connection for each
+        thread, opened the first time the thread runs a query.
+        Threads should call wl.db.close() when they're done. With
+        a pool_size, a work log with its own database keeps up to
+        that many connections in a pool and close() hands a
+        thread's connection back to it for reuse.
+
+        >>> first = Worklog(":memory:")
+        >>> first.build_database_tables()
+        True
+        >>> first.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 10, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> second = Worklog(":memory:")
+        >>> second.build_database_tables()
+        True
+        >>> first.get_total_number_of_tasks()
+        1
+        >>> second.get_total_number_of_tasks()
+        0
+
+        """
+
+        if database_name is None:
+            self.db = database_connection
+        elif pool_size is not None:
+            from playhouse.pool import PooledSqliteDatabase
+
+            # Pooled connections move between threads.
+            self.db = PooledSqliteDatabase(
+                None, max_connections=pool_size, timeout=SERVER_POOL_WAIT,
+                check_same_thread=False)
+        else:
+            self.db = SqliteDatabase(None)
+        # Whether the database uses compact storage, which is
+        # checked whenever it's connected.
+        self.compact = False
+        self.Employee, self.Task, self.TaskSearchIndex = self.bind_models()
+        # Employee ids by name, for the employees that tasks have
+        # been written for.
+        self.employee_ids = {}
+        self.full_text_search = False
+        # The choice lists from the last time each selection menu
+        # was shown, keyed by "employee", "date" and "time".
+        self.menu_choices = {}
+        # Set to a QueryStats by enable_instrumentation.
+        self.stats = None
+        # Tasks waiting to be written, a list once
+        # enable_write_buffer is called.
+        self.write_buffer = None
+        # The archive models, set by attach_archive. Lookups only
+        # read the archive when include_archive is set.
+        self.ArchivedTask = None
+        self.AllTasks = None
+        self.include_archive = False
+        # The in-memory Worklog lookups are sent to, set by
+        # enable_read_replica.
+        self.replica = None
+        # A QueryCache once enable_query_cache is called.
+        self.cache = None
+
+        if database_name is not None:
+            self.connect_to_database(database_name, profile)
 
     def add_task(self, params):
         """Add an entry to the database
@@ -39,8 +539,170 @@ class Worklog:
         1
 
         """
-        new_task = Task.create(**params)
-        new_task.save()
+        if self.write_buffer is not None:
+            self.buffer_task(params)
+            return
+
+        self.run_write(self.insert_rows, [self.task_row(params)])
+        # Outside run_write, so a locked replica can't make it
+        # insert the rows again.
+        if self.replica is not None:
+            self.sync_replica()
+        self.tasks_changed()
+
+    def add_tasks(self, tasks, chunk_size=5000):
+        """Add many entries to the database at once.
+
+        Each entry is checked with validate_task_params and the
+        ones that fail are skipped. The rest are written with
+        multi-row inserts, one transaction per chunk_size entries.
+        Returns the number of entries added and skipped.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_tasks([
+        ...     {"employee": "Bob", "task": "Make stuff", "minutes": "20",
+        ...      "notes": "Good stuff here", "date": "2017-01-01"},
+        ...     {"employee": "Alex", "task": "Alex top task", "minutes": 30,
+        ...      "date": "2016-10-21"},
+        ...     {"employee": "Alex2", "task": "Bad name", "minutes": 30,
+        ...      "date": "2016-10-21"}], chunk_size=1)
+        (2, 1)
+        >>> wl.get_list_of_times()
+        [20, 30]
+        >>> wl.get_tasks_by_search("top")[0]["notes"]
+        ''
+
+        """
+
+        added = 0
+        skipped = 0
+
+        for chunk in chunked(tasks, chunk_size):
+            rows = []
+            for params in chunk:
+                if self.validate_task_params(params):
+                    rows.append(self.task_row(params))
+                else:
+                    skipped += 1
+
+            self.run_write(self.insert_rows, rows)
+            added += len(rows)
+            if self.replica is not None:
+                self.sync_replica()
+
+        self.tasks_changed()
+        return added, skipped
+
+    def add_missing_indexes(self):
+        """Create any indexes the Task model defines that
+        aren't in the database yet. Older database.db files were
+        built before the indexes existed, so this brings them up
+        to date in place. Returns the names of the indexes that
+        were created.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.db.create_tables([Task], safe=True)
+        >>> wl.add_missing_indexes()
+        []
+        >>> cursor = wl.db.execute_sql('DROP INDEX "task_employee_id_date"')
+        >>> wl.add_missing_indexes()
+        ['task_employee_id_date']
+
+        """
+
+        existing_indexes = set(
+            index.name
+            for index in self.db.get_indexes(self.Task._meta.table_name))
+        missing_indexes = [
+            index._name for index in self.Task._meta.fields_to_index()
+            if index._name not in existing_indexes]
+
+        if missing_indexes:
+            self.Task._schema.create_indexes(safe=True)
+
+        return sorted(missing_indexes)
+
+    def archive_tasks(self, before, batch_size=ARCHIVE_BATCH_ROWS):
+        """Move the tasks dated before a cutoff from the task table
+        to the attached archive, batch_size tasks at a time, and
+        return how many were moved.
+
+        Each batch is copied to the archive in one transaction and
+        then deleted from the task table in another, so a crash in
+        between leaves tasks in both places rather than losing them.
+        Archiving again finishes the move. The task with the highest
+        id always stays in the task table, so SQLite doesn't hand
+        out the ids of archived tasks again.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.attach_archive(":memory:")
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-11-01"})
+        >>> wl.archive_tasks("2016-12-01", batch_size=1)
+        1
+        >>> wl.get_list_of_employees()
+        ['Alex', 'Bob']
+        >>> wl.get_list_of_dates()
+        [datetime.date(2016, 11, 1), datetime.date(2017, 1, 1)]
+        >>> wl.archive_tasks("not a date")
+        Traceback (most recent call last):
+        ...
+        ValueError: Dates must be in the YYYY-MM-DD format.
+
+        """
+
+        if not self.validate_date(str(before)):
+            raise ValueError("Dates must be in the YYYY-MM-DD format.")
+        if self.ArchivedTask is None:
+            raise ValueError("There's no archive attached.")
+
+        newest_id = self.Task.select(fn.MAX(self.Task.id)).scalar()
+        columns = [getattr(self.Task, name) for name in TaskRecord._fields]
+        archived_columns = [
+            getattr(self.ArchivedTask, name) for name in TaskRecord._fields]
+
+        def copy_to_archive(ids):
+            (self.ArchivedTask
+             .insert_from(self.Task.select(*columns)
+                          .where(self.Task.id.in_(ids)),
+                          archived_columns)
+             .on_conflict_ignore()
+             .execute())
+
+        def delete_from_task_table(ids):
+            self.Task.delete().where(self.Task.id.in_(ids)).execute()
+
+        moved = 0
+
+        while newest_id is not None:
+            ids = [row[0] for row in (
+                self.Task.select(self.Task.id)
+                .where((self.Task.date < before) &
+                       (self.Task.id < newest_id))
+                .order_by(self.Task.id)
+                .limit(batch_size)
+                .tuples())]
+            if not ids:
+                break
+
+            self.run_write(copy_to_archive, ids)
+            self.run_write(delete_from_task_table, ids)
+            moved += len(ids)
+
+        self.tasks_changed()
+        if self.replica is not None:
+            self.refresh_replica()
+        return moved
 
     def ask_for_input(self):
         """Generic method to gather user input to
@@ -48,6 +710,146 @@ class Worklog:
         """
         return input("> ").strip()
 
+    def attach_archive(self, archive_name, include_archive=False):
+        """Attach an archive database file, creating its task table
+        if it doesn't exist yet. Every connection the work log opens
+        attaches it.
+
+        Lookups and the menu lists only read the task table unless
+        include_archive is set (it can also be changed later with
+        wl.include_archive). Then they read the task table and the
+        archive together with UNION ALL, and searches check the
+        task names and notes for the term as a substring since the
+        archive doesn't have a search index.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.attach_archive(":memory:", include_archive=True)
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-11-01"})
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.archive_tasks("2016-12-01")
+        2
+        >>> wl.get_total_number_of_tasks()
+        3
+        >>> [task["task"] for task in wl.get_tasks_by_search("task")]
+        ['Another task', 'Alex top task']
+        >>> wl.include_archive = False
+        >>> wl.get_total_number_of_tasks()
+        1
+
+        """
+
+        worklog_database = self.db
+        worklog_database.attach(archive_name, ARCHIVE_SCHEMA)
+
+        class ArchivedTask(self.Task):
+            class Meta:
+                database = worklog_database
+                schema = ARCHIVE_SCHEMA
+                table_name = Task._meta.table_name
+
+        # Reads a common table expression that select_tasks adds.
+        class AllTasks(self.Task):
+            class Meta:
+                database = worklog_database
+                table_name = "all_tasks"
+
+        self.ArchivedTask = ArchivedTask
+        self.migrate_to_employee_table(ARCHIVE_SCHEMA)
+        if self.compact:
+            self.convert_to_compact_storage(ARCHIVE_SCHEMA)
+        self.db.create_tables([ArchivedTask], safe=True)
+        self.AllTasks = AllTasks
+        self.include_archive = include_archive
+        self.tasks_changed()
+
+    def bind_models(self):
+        """Return the Employee, Task and TaskSearchIndex models to
+        use with this work log's database. The module's models are
+        used for the shared connection. Any other database gets
+        subclasses of them bound to it, which use the same tables.
+        With compact storage the Task subclass has compact date
+        and notes fields.
+
+        >>> wl = Worklog()
+        >>> wl.bind_models() == (Employee, Task, TaskSearchIndex)
+        True
+        >>> wl.db = SqliteDatabase(None)
+        >>> BoundEmployee, BoundTask, BoundSearchIndex = wl.bind_models()
+        >>> BoundTask._meta.database is wl.db
+        True
+        >>> BoundTask._meta.table_name
+        'task'
+        >>> BoundTask.employee.rel_model is BoundEmployee
+        True
+
+        """
+
+        if self.db is database_connection and not self.compact:
+            return Employee, Task, TaskSearchIndex
+
+        worklog_database = self.db
+
+        # The indexes are named after the tables, not the classes,
+        # so they match the ones the module's models create.
+        class BoundEmployee(Employee):
+            class Meta:
+                database = worklog_database
+                legacy_table_names = False
+                table_name = Employee._meta.table_name
+
+        class BoundTask(Task):
+            employee = ForeignKeyField(
+                BoundEmployee, column_name="employee_id")
+
+            class Meta:
+                database = worklog_database
+                legacy_table_names = False
+                table_name = Task._meta.table_name
+
+        if self.compact:
+            class CompactTask(BoundTask):
+                date = DayNumberField(index=True)
+                notes = CompressedTextField()
+
+                class Meta:
+                    database = worklog_database
+                    legacy_table_names = False
+                    table_name = Task._meta.table_name
+
+            BoundTask = CompactTask
+
+        class BoundTaskSearchIndex(TaskSearchIndex):
+            class Meta:
+                database = worklog_database
+                table_name = TaskSearchIndex._meta.table_name
+
+        return BoundEmployee, BoundTask, BoundTaskSearchIndex
+
+    def buffer_task(self, params):
+        """Queue a task for the next flush_writes, flushing now if
+        the buffer is full or its oldest task has waited too long.
+        """
+
+        with self.write_lock:
+            if not self.write_buffer:
+                self.write_buffer_started = perf_counter()
+                if self.write_timer_enabled:
+                    self.start_write_timer()
+            self.write_buffer.append(self.task_row(params))
+            is_due = (
+                len(self.write_buffer) >= self.write_buffer_rows or
+                perf_counter() - self.write_buffer_started >=
+                self.write_buffer_seconds)
+
+        if is_due:
+            self.flush_writes()
+
     def build_database_tables(self):
         """Create the actual database tables
 
@@ -55,29 +857,276 @@ class Worklog:
         >>> wl.connect_to_database(":memory:")
         >>> wl.build_database_tables()
         True
+        >>> sorted(index.name for index in wl.db.get_indexes("task"))
+        ['task_date', 'task_date_employee_id_minutes', 'task_employee_id', \
+'task_employee_id_date', 'task_minutes', 'task_minutes_date']
+
+        """
+
+        self.db.create_tables([self.Employee], safe=True)
+        self.migrate_to_employee_table()
+        self.db.create_tables([self.Task], safe=True)
+        self.add_missing_indexes()
+        self.build_search_index()
+        return self.Task.table_exists()
+
+    def build_search_index(self):
+        """Create the full-text search index for the tasks if the
+        SQLite build supports FTS5. An index that's created for a
+        database that already has tasks is backfilled from them.
+        Returns True if full-text search is available.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.db.create_tables([Employee, Task], safe=True)
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.build_search_index()
+        True
+        >>> TaskSearchIndex.select().where( \
+        TaskSearchIndex.match("stuff")).count()
+        1
 
         """
 
-        self.db.create_tables([Task], safe=True)
-        return Task.table_exists()
+        if not self.TaskSearchIndex.fts5_installed():
+            self.full_text_search = False
+            return self.full_text_search
+
+        needs_backfill = not self.TaskSearchIndex.table_exists()
+        self.TaskSearchIndex.create_table(safe=True)
+        for trigger in SEARCH_INDEX_TRIGGERS:
+            if self.compact:
+                # Index the notes, not their compressed bytes.
+                trigger = re.sub(r"\b(new|old)\.notes\b",
+                                 NOTES_FUNCTION + r"(\1.notes)", trigger)
+            self.db.execute_sql(trigger)
+        if needs_backfill and self.compact:
+            self.db.execute_sql(
+                "INSERT INTO {} (rowid, task, notes) "
+                "SELECT id, task, {}(notes) FROM {}".format(
+                    self.TaskSearchIndex._meta.table_name, NOTES_FUNCTION,
+                    self.Task._meta.table_name))
+        elif needs_backfill:
+            self.TaskSearchIndex.rebuild()
+
+        self.full_text_search = True
+        return self.full_text_search
+
+    def cache_method(self, name):
+        """Return a version of one of this work log's methods that
+        answers from self.cache when it can.
+        """
+
+        method = getattr(self, name)
+        cache = self.cache
+
+        def cached_method(*args, **kwargs):
+            connection = self.db.connection()
+            data_version = connection.execute(
+                "PRAGMA data_version").fetchone()[0]
+            cache.check(database_generations.get(self.db, 0),
+                        connection, data_version)
+
+            key = (name, args, tuple(sorted(kwargs.items())),
+                   self.include_archive)
+            try:
+                hash(key)
+            except TypeError:
+                return method(*args, **kwargs)
+            result = cache.get(key, partial(method, *args, **kwargs))
+
+            # A cache hit doesn't run the method, which would have
+            # stored the list the menu choices are picked from.
+            if name in MENU_LIST_METHODS:
+                self.menu_choices[MENU_LIST_METHODS[name]] = result
+            return result
+
+        cached_method.__name__ = name
+        cached_method.__doc__ = method.__doc__
+        return cached_method
+
+    def check_storage(self):
+        """See whether the database uses compact storage and bind
+        the models to match. The employee ids remembered from the
+        database that was open before are forgotten.
+        """
+        self.employee_ids = {}
+        self.compact = self.uses_compact_storage()
+        self.Employee, self.Task, self.TaskSearchIndex = self.bind_models()
 
     def clear_screen(self):
         """Convience method for clearing the screen
         """
-        os.system('cls' if os.name == 'nt' else 'clear')
+        if os.name == 'nt':
+            os.system('cls')
+        else:
+            sys.stdout.write(CLEAR_SCREEN)
+            sys.stdout.flush()
 
-    def connect_to_database(self, database_name):
+    def connect_to_database(self, database_name, profile="tuned"):
         """Make the database connection
 
+        profile is the name of one of the PRAGMA_PROFILES or a
+        dict of pragmas to apply to the connection.
+
+        >>> import tempfile
         >>> wl = Worklog()
         >>> wl.connect_to_database(":memory:")
         >>> wl.db.is_closed()
         False
+        >>> wl.db.execute_sql("PRAGMA temp_store").fetchone()
+        (2,)
+        >>> wl.connect_to_database(":memory:", {"cache_size": -1024})
+        >>> wl.db.execute_sql("PRAGMA cache_size").fetchone()
+        (-1024,)
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     wl.connect_to_database(os.path.join(directory, "test.db"))
+        ...     wl.db.execute_sql("PRAGMA journal_mode").fetchone()
+        ...     wl.db.close()
+        ('wal',)
+        True
+
+        Reconnecting starts over with the new database's employees.
+
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "", "date": "2017-01-01"})
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "", "date": "2017-01-01"})
+        >>> wl.get_list_of_employees()
+        ['Bob']
+        >>> len(wl.get_tasks_for_employee(1))
+        1
 
         """
 
-        self.db.init(database_name)
+        if isinstance(profile, str):
+            profile = PRAGMA_PROFILES[profile]
+
+        self.db.register_function(decompress_notes, NOTES_FUNCTION, 1)
+        self.db.init(database_name, pragmas=profile,
+                     uri=database_name.startswith("file:"))
         self.db.connect()
+        self.check_storage()
+
+    def convert_to_compact_storage(self, schema="main",
+                                   batch_size=MIGRATION_BATCH_ROWS):
+        """Switch the task table to compact storage and return the
+        number of tasks converted.
+
+        Compact storage keeps each date as an integer day number
+        instead of text, and notes longer than NOTES_COMPRESS_BYTES
+        zlib-compressed. Lookups decode both, so tasks read the same
+        either way. The tasks are copied to a new table batch_size
+        at a time, one transaction per batch, which then replaces
+        the old table. An interrupted conversion picks up after the
+        last copied batch. The SQL function that decompresses the
+        notes is registered by connect_to_database, so other
+        programs can't write to a compact database's task table.
+        schema is "main", or the archive schema to convert an
+        archive, which happens when one is attached to a compact
+        database.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Long notes", \
+        "minutes": 30, "notes": "pasted log " * 100, "date": "2016-10-21"})
+        >>> wl.convert_to_compact_storage(batch_size=1)
+        2
+        >>> cursor = wl.db.execute_sql(
+        ...     "SELECT typeof(date), typeof(notes) FROM task ORDER BY id")
+        >>> cursor.fetchall()
+        [('integer', 'text'), ('integer', 'blob')]
+        >>> tasks = wl.get_tasks_between("2016-10-01", "2016-10-31")
+        >>> tasks[0]["date"], len(tasks[0]["notes"])
+        (datetime.date(2016, 10, 21), 1100)
+        >>> wl.get_tasks_by_search("pasted")[0]["task"]
+        'Long notes'
+        >>> wl.get_minutes_totals("month")
+        [('Alex', '2016-10', 30), ('Bob', '2017-01', 20)]
+        >>> wl.convert_to_compact_storage()
+        0
+        >>> new_worklog = Worklog(":memory:")
+        >>> new_worklog.convert_to_compact_storage()
+        0
+        >>> new_worklog.uses_compact_storage()
+        True
+
+        """
+
+        table_name = self.Task._meta.table_name
+        if self.uses_compact_storage(schema):
+            return 0
+
+        worklog_database = self.db
+        self.compact = True
+        self.Employee, self.Task, self.TaskSearchIndex = self.bind_models()
+        if not self.db.table_exists(table_name, schema):
+            # A new database, whose tables are created compact.
+            if schema == "main":
+                self.build_database_tables()
+            return 0
+
+        conversion_schema = None if schema == "main" else schema
+        conversion_table_name = table_name + "_conversion"
+
+        class ConvertedTask(self.Task):
+            class Meta:
+                database = worklog_database
+                schema = conversion_schema
+                table_name = conversion_table_name
+
+        old_table = '"{}"."{}"'.format(schema, table_name)
+        new_table = '"{}"."{}"'.format(schema, conversion_table_name)
+        columns = ["id", "date", "employee", "minutes", "notes", "task"]
+
+        def copy_batch(after_id):
+            rows = self.db.execute_sql(
+                "SELECT id, date, employee_id, minutes, notes, task "
+                "FROM {} WHERE id > ? ORDER BY id LIMIT ?".format(old_table),
+                (after_id, batch_size)).fetchall()
+            with self.db.atomic():
+                for insert_rows in chunked(rows, ROWS_PER_INSERT):
+                    (ConvertedTask
+                     .insert_many(insert_rows,
+                                  fields=[getattr(ConvertedTask, name)
+                                          for name in columns])
+                     .execute())
+            return len(rows)
+
+        def replace_old_table():
+            with self.db.atomic():
+                self.db.execute_sql("DROP TABLE {}".format(old_table))
+                self.db.execute_sql('ALTER TABLE {} RENAME TO "{}"'.format(
+                    new_table, table_name))
+
+        ConvertedTask._schema.create_table(safe=True)
+
+        converted = 0
+        while True:
+            last_id = ConvertedTask.select(
+                fn.COALESCE(fn.MAX(ConvertedTask.id), 0)).scalar()
+            copied = self.run_write(copy_batch, last_id)
+            if not copied:
+                break
+            converted += copied
+
+        self.run_write(replace_old_table)
+        if schema == "main":
+            self.build_database_tables()
+        self.tasks_changed()
+        return converted
 
     def display_date_selection_prompt(self, dates):
         """Show the date selection menu
@@ -99,9 +1148,10 @@ class Worklog:
         2. 2017-01-01
         """
 
-        print("Choose a date:")
+        lines = ["Choose a date:"]
         for date_index, date in enumerate(dates):
-            print("{}. {}".format(int(date_index) + 1, date))
+            lines.append("{}. {}".format(int(date_index) + 1, date))
+        self.write_output("\n".join(lines) + "\n")
 
     def display_employee_name_prompt(self):
         """Show the initial add task_prompt
@@ -124,12 +1174,31 @@ class Worklog:
         2. Bob
 
         """
-        print("Which employee do you want to review:")
+        lines = ["Which employee do you want to review:"]
         for employee_index, employee in enumerate(employee_array):
-            print(
+            lines.append(
                 "{number}. {name}".format(
                     number=employee_index + 1,
                     name=employee))
+        self.write_output("\n".join(lines) + "\n")
+
+    def display_totals_period_prompt(self):
+        """Ask how the time totals should be grouped.
+
+        >>> wl = Worklog()
+        >>> wl.display_totals_period_prompt()
+        How do you want to total the time spent:
+        1. By Day
+        2. By Week
+        3. By Month
+        4. Whole Range
+
+        """
+        print("How do you want to total the time spent:")
+        print("1. By Day")
+        print("2. By Week")
+        print("3. By Month")
+        print("4. Whole Range")
 
     def display_time_selection_prompt(self, times_array):
         """Display prompt to for a number of times.
@@ -142,12 +1211,13 @@ class Worklog:
 
         """
 
-        print("What amount of time spent do you want to review:")
+        lines = ["What amount of time spent do you want to review:"]
         for time_index, time in enumerate(times_array):
-            print(
+            lines.append(
                 "{number}. {time}".format(
                     number=time_index + 1,
                     time=time))
+        self.write_output("\n".join(lines) + "\n")
 
     def display_lookup_prompt(self):
         """Ask how the user wants to lookup entries.
@@ -159,6 +1229,7 @@ class Worklog:
         2. By Date
         3. By Search Term
         4. By Time Spent
+        5. By Date Range
 
         """
         print("How do you want to lookup entires:")
@@ -166,6 +1237,7 @@ class Worklog:
         print("2. By Date")
         print("3. By Search Term")
         print("4. By Time Spent")
+        print("5. By Date Range")
 
     def display_main_prompt(self):
         """This is the top level prompt for the interface.
@@ -174,13 +1246,17 @@ class Worklog:
         >>> wl.display_main_prompt()
         1. Add a new task
         2. Lookup tasks
-        3. Quit
+        3. Show time totals
+        4. Quit
 
         """
 
         print("1. Add a new task")
         print("2. Lookup tasks")
-        print("3. Quit")
+        print("3. Show time totals")
+        print("4. Quit")
+        if self.replica is not None:
+            print("5. Reload the in-memory copy of the database")
 
     def display_minutes_prompt(self):
         """Ask for how many minutes were spent on the task
@@ -215,6 +1291,29 @@ class Worklog:
 
         print("Enter notes about the task, or hit Enter/Return to skip them:")
 
+    def display_date_range_prompt(self, which_date):
+        """Ask for the start or end date of a date range
+
+        >>> wl = Worklog()
+        >>> wl.display_date_range_prompt("end")
+        Enter the end date (e.g. 2017-01-31):
+
+        """
+
+        print("Enter the {} date (e.g. 2017-01-31):".format(which_date))
+
+    def display_optional_date_prompt(self, which_date):
+        """Ask for an optional start or end date
+
+        >>> wl = Worklog()
+        >>> wl.display_optional_date_prompt("start")
+        Enter the start date (e.g. 2017-01-31), or hit Enter/Return to skip it:
+
+        """
+
+        print("Enter the {} date (e.g. 2017-01-31), "
+              "or hit Enter/Return to skip it:".format(which_date))
+
     def display_search_prompt(self):
         """Ask for the search term
 
@@ -226,71 +1325,280 @@ class Worklog:
 
         print("What term would you like to search for?")
 
-    def get_list_of_dates(self):
-        """Return a list of the dates in the database
+    def enable_query_cache(self, max_entries=QUERY_CACHE_SIZE):
+        """Cache the results of the lookups in CACHED_METHODS, up to
+        max_entries of them, keyed by the method and its arguments.
+        See QueryCache for when the cache is emptied. The hit and
+        miss counts are wl.cache.hits and wl.cache.misses.
 
-        >>> wl = Worklog()
-        >>> wl.connect_to_database(":memory:")
+        >>> wl = Worklog(":memory:")
         >>> wl.build_database_tables()
         True
+        >>> wl.enable_query_cache()
         >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
         "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.get_list_of_employees()
+        ['Bob']
+        >>> wl.get_list_of_employees()
+        ['Bob']
         >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
         "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.get_list_of_dates()
-        [datetime.date(2016, 10, 21), datetime.date(2017, 1, 1)]
+        >>> wl.get_list_of_employees()
+        ['Alex', 'Bob']
+        >>> wl.cache.hits, wl.cache.misses
+        (1, 2)
+
+        Lists answered from the cache are still the ones menu choices
+        are picked from, and work logs sharing a database see each
+        other's changes.
+
+        >>> wl.menu_choices["employee"] = ["Carl"]
+        >>> wl.get_list_of_employees()
+        ['Alex', 'Bob']
+        >>> wl.get_menu_choice("employee", "1")
+        'Alex'
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.enable_query_cache()
+        >>> wl.get_list_of_employees()
+        []
+        >>> Worklog().add_task({"employee": "Carl", "task": "Carl's task", \
+        "minutes": 10, "notes": "", "date": "2017-01-02"})
+        >>> wl.get_list_of_employees()
+        ['Carl']
+
         """
 
-        dates = []
+        if self.cache is not None:
+            return
+
+        self.cache = QueryCache(max_entries)
+
+        for name in CACHED_METHODS:
+            setattr(self, name, self.cache_method(name))
+
+    def enable_read_replica(self):
+        """Copy the database into memory with SQLite's backup API
+        and answer the lookups in REPLICA_METHODS from the copy.
+
+        Tasks added through this work log are written to the
+        database and then copied to the replica, along with any
+        other tasks that were added to the database since. Changes
+        made by other programs aren't seen until refresh_replica is
+        called. The replica only has the main database, not an
+        attached archive.
+
+        The copy is a shared-cache in-memory database, so every
+        thread's connection sees the same copy. It lasts as long as
+        the replica's first connection is open.
+
+        >>> import tempfile
+        >>> task = {"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"}
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     database_name = os.path.join(directory, "test.db")
+        ...     wl = Worklog(database_name)
+        ...     wl.build_database_tables()
+        ...     wl.add_task(task)
+        ...     wl.enable_read_replica()
+        ...     wl.add_task(dict(task, employee="Alex"))
+        ...     wl.get_list_of_employees()
+        ...     other = Worklog(database_name)
+        ...     other.add_task(dict(task, employee="Chris"))
+        ...     wl.get_total_number_of_tasks()
+        ...     wl.refresh_replica()
+        ...     wl.get_tasks_for_employee(3)[0]["employee"]
+        ...     other.db.close()
+        ...     wl.db.close()
+        ...     wl.replica.db.close()
+        True
+        ['Alex', 'Bob']
+        2
+        'Chris'
+        True
+        True
+        True
 
-        for task in Task.select():
-            dates.append(task.date)
+        Instrumentation and the query cache keep working when they
+        were turned on before the replica.
+
+        >>> import io
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     wl = Worklog(os.path.join(directory, "test.db"))
+        ...     wl.build_database_tables()
+        ...     wl.add_task(task)
+        ...     wl.enable_instrumentation(log_file=io.StringIO())
+        ...     wl.enable_query_cache()
+        ...     wl.enable_read_replica()
+        ...     wl.get_list_of_employees()
+        ...     wl.get_list_of_employees()
+        ...     wl.stats.counts["get_list_of_employees"]
+        ...     wl.stats.counts["sql"] > 0
+        ...     wl.cache.hits, wl.cache.misses
+        ...     wl.db.close()
+        ...     wl.replica.db.close()
+        True
+        ['Bob']
+        ['Bob']
+        1
+        True
+        (1, 1)
+        True
+        True
 
-        dates = list(set(dates))
-        dates.sort()
+        """
 
-        return dates
+        if self.replica is not None:
+            return
+
+        replica = Worklog("file:worklog-replica-{}?mode=memory&cache=shared"
+                          .format(id(self)))
+        replica.menu_choices = self.menu_choices
+        self.replica = replica
+        self.refresh_replica()
+
+        for name in REPLICA_METHODS:
+            setattr(self, name, getattr(replica, name))
+            # Put back the timing and caching that were around the
+            # method before it was sent to the replica.
+            if self.stats is not None and name in INSTRUMENTED_METHODS:
+                setattr(self, name, self.instrument_method(name))
+            if self.cache is not None and name in CACHED_METHODS:
+                setattr(self, name, self.cache_method(name))
+
+        if self.stats is not None:
+            self.instrument_database(replica.db)
+
+    def enable_write_buffer(self, max_rows=WRITE_BUFFER_ROWS,
+                            interval=WRITE_BUFFER_SECONDS):
+        """Buffer the tasks passed to add_task and write them in
+        batches, one transaction (and one sync to disk) per batch
+        instead of one per task.
+
+        A batch is written when it has max_rows tasks, when its
+        first task has waited interval seconds, when flush_writes
+        is called and when the program exits normally. Buffered
+        tasks don't show up in lookups until they're written.
+
+        On a crash, or if the process is killed, the tasks still in
+        the buffer are lost: at most max_rows tasks, or interval
+        seconds' worth. A batch is written all or nothing, and once
+        flush_writes returns its tasks are as durable as any other
+        write with the connection's SQLite settings.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.enable_write_buffer(max_rows=3)
+        >>> for day in range(1, 5):
+        ...     wl.add_task({"employee": "Bob", "task": "Make stuff",
+        ...                  "minutes": day, "notes": "",
+        ...                  "date": "2017-01-0{}".format(day)})
+        >>> wl.get_total_number_of_tasks()
+        3
+        >>> wl.flush_writes()
+        1
+        >>> wl.get_total_number_of_tasks()
+        4
 
-    def get_list_of_employees(self):
-        """Return a list of the employees in the database
+        """
 
-        >>> wl = Worklog()
-        >>> wl.connect_to_database(":memory:")
+        import atexit
+
+        if self.write_buffer is not None:
+            return
+
+        self.write_buffer_rows = max_rows
+        self.write_buffer_seconds = interval
+        self.write_buffer_started = None
+        self.write_lock = threading.Lock()
+        # Timer threads get their own connection, which would be an
+        # empty database if the work log is in memory.
+        self.write_timer_enabled = self.db.database != ":memory:"
+        self.write_buffer = []
+        atexit.register(self.flush_writes)
+
+    def enable_instrumentation(self, slow_query_ms=SLOW_QUERY_MS,
+                               log_file=None, dump_on_exit=False):
+        """Start timing the data methods and the SQL they run.
+
+        Each method in INSTRUMENTED_METHODS and every statement run
+        on the database connection gets a call count and latency
+        histogram in self.stats. Statements that take longer than
+        slow_query_ms are written to log_file (stderr by default)
+        with their parameters and EXPLAIN QUERY PLAN output. The SQL
+        timing covers running the statement up to its first rows.
+
+        With dump_on_exit the stats are written to log_file when the
+        program exits, and on SIGUSR1 where that signal exists.
+
+        Nothing is wrapped until this is called, so there's no cost
+        when instrumentation is off. The database connection is
+        wrapped too, so with the shared connection every Worklog's
+        SQL is counted.
+
+        >>> import io
+        >>> wl = Worklog(":memory:")
         >>> wl.build_database_tables()
         True
+        >>> log = io.StringIO()
+        >>> wl.enable_instrumentation(slow_query_ms=0, log_file=log)
         >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
         "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
-        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> employee_list = wl.get_list_of_employees()
-        >>> employee_list[0]
-        'Alex'
-        >>> employee_list[1]
-        'Bob'
+        >>> tasks = wl.get_tasks_for_employee("1")
+        >>> wl.stats.counts["get_tasks_for_employee"]
+        1
+        >>> wl.stats.counts["get_list_of_employees"]
+        1
+        >>> wl.stats.counts["sql"] > 2
+        True
+        >>> print(log.getvalue().splitlines()[-1].split("INDEX ")[-1])
+        task_employee_id_date (employee_id=?)
 
         """
 
-        employees = []
+        if self.stats is not None:
+            return
 
-        for task in Task.select():
-            employees.append(task.employee)
+        if log_file is None:
+            log_file = sys.stderr
 
-        unique_list_of_employees = list(set(employees))
-        unique_list_of_employees.sort()
+        self.stats = stats = QueryStats()
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = log_file
 
-        return unique_list_of_employees
+        for name in INSTRUMENTED_METHODS:
+            setattr(self, name, self.instrument_method(name))
 
-    def get_list_of_times(self):
-        """Return a list of the times that tasks took.
+        self.instrument_database(self.db)
+        if self.replica is not None:
+            self.instrument_database(self.replica.db)
+
+        if dump_on_exit:
+            import atexit
+            import signal
+
+            def dump_stats(*signal_args):
+                log_file.write(stats.format_report())
+                if self.cache is not None:
+                    log_file.write("query cache: {} hits, {} misses\n".format(
+                        self.cache.hits, self.cache.misses))
+                log_file.flush()
+
+            atexit.register(dump_stats)
+            if hasattr(signal, "SIGUSR1"):
+                signal.signal(signal.SIGUSR1, dump_stats)
 
-        Note that the code to sort the output isn't
-        properly tested by this set of tests. More research needs
-        to be done if that becomes necessary.
+    def export_tasks(self, output_file, file_format="csv", **filters):
+        """Write tasks to an open file as CSV or JSON Lines, in
+        date order. The filters are the same as the ones tasks_query
+        takes. Rows are streamed from a database cursor so memory
+        use doesn't grow with the number of tasks. Returns the
+        number of tasks written.
 
+        >>> import io
         >>> wl = Worklog()
         >>> wl.connect_to_database(":memory:")
         >>> wl.build_database_tables()
@@ -301,64 +1609,555 @@ class Worklog:
         "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
         >>> wl.add_task({"employee": "Alex", "task": "Another task", \
         "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> times = wl.get_list_of_times()
-        >>> times[0]
-        20
-        >>> len(times)
-        2
+        >>> output = io.StringIO()
+        >>> wl.export_tasks(output)
+        3
+        >>> print(output.getvalue().replace("\\r", ""))
+        employee,task,minutes,notes,date
+        Alex,Alex top task,30,Good stuff here too,2016-10-21
+        Alex,Another task,30,Good stuff here too,2016-10-21
+        Bob,Make stuff,20,Good stuff here,2017-01-01
+        <BLANKLINE>
+        >>> output = io.StringIO()
+        >>> wl.export_tasks( \
+        output, "jsonl", employee="Alex", search_term="top")
+        1
+        >>> print(output.getvalue())
+        {"employee": "Alex", "task": "Alex top task", "minutes": 30, \
+"notes": "Good stuff here too", "date": "2016-10-21"}
+        <BLANKLINE>
 
         """
-        database_times = []
 
-        for task in Task.select():
-            database_times.append(task.minutes)
+        LookupTask = self.lookup_model()
+        rows = (self.tasks_query(**filters)
+                .select(*self.task_columns(TASK_FILE_FIELDS))
+                .order_by(LookupTask.date, LookupTask.id)
+                .tuples()
+                .iterator())
 
-        unique_list_of_times = list(set(database_times))
-        unique_list_of_times.sort()
+        if file_format == "csv":
+            import csv
 
-        return unique_list_of_times
+            writer = csv.writer(output_file)
+            writer.writerow(TASK_FILE_FIELDS)
+            write_row = writer.writerow
+        else:
+            import json
 
-    def get_tasks_by_search(self, search_term):
-        """Get the tasks for a given search term
+            def write_row(row):
+                output_file.write(json.dumps(
+                    dict(zip(TASK_FILE_FIELDS, row)), default=str) + "\n")
 
-        >>> wl = Worklog()
-        >>> wl.connect_to_database(":memory:")
-        >>> wl.build_database_tables()
-        True
-        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
-        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
-        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> tasks = wl.get_tasks_by_search("task")
-        >>> len(tasks)
-        2
-        >>> tasks[0]["employee"]
-        'Alex'
-        >>> tasks = wl.get_tasks_by_search("stuff")
-        >>> len(tasks)
-        3
+        row_count = 0
+        for row in rows:
+            write_row(row)
+            row_count += 1
+
+        return row_count
+
+    def flush_writes(self):
+        """Write the buffered tasks in one transaction and return how
+        many were written. Does nothing without a write buffer.
+
+        If the write fails the tasks go back in the buffer and the
+        error is raised.
         """
 
-        tasks = []
+        if not self.write_buffer:
+            return 0
 
-        all_tasks = Task.select().order_by(Task.date.desc())
+        with self.write_lock:
+            rows = self.write_buffer
+            self.write_buffer = []
 
-        for task_item in all_tasks.where(Task.task.contains(
-                search_term) | Task.notes.contains(search_term)):
-            tasks.append({
-                "task": task_item.task,
-                "employee": task_item.employee,
-                "minutes": task_item.minutes,
-                "date": task_item.date,
-                "notes": task_item.notes
-            })
+        try:
+            self.run_write(self.insert_rows, rows)
+        except Exception:
+            with self.write_lock:
+                self.write_buffer[:0] = rows
+            raise
 
-        return tasks
+        if self.replica is not None:
+            self.sync_replica()
 
-    def get_tasks_for_date(self, date_number):
-        """Return the tasks for a given date.
+        self.tasks_changed()
+        return len(rows)
+
+    def format_report_for_tasks(self, tasks):
+        """Build the text of the report for a set of tasks
+
+        >>> wl = Worklog()
+        >>> report = wl.format_report_for_tasks([{"employee": "Bob", \
+        "date": "2017-01-01", "task": "Make stuff", "minutes": 20, \
+        "notes": "Good stuff here"}])
+        >>> print(report, end="")
+        Here are the tasks:
+        <BLANKLINE>
+        ---
+        Employee: Bob
+        Date: 2017-01-01
+        Task: Make stuff
+        Time Spent: 20 min.
+        Notes: Good stuff here
+        <BLANKLINE>
+
+        """
+
+        lines = ["Here are the tasks:", ""]
+
+        for task in tasks:
+            lines.append("---")
+            lines.append("Employee: {}".format(task["employee"]))
+            lines.append("Date: {}".format(task["date"]))
+            lines.append("Task: {}".format(task["task"]))
+            lines.append("Time Spent: {} min.".format(task["minutes"]))
+            lines.append("Notes: {}".format(task["notes"]))
+            lines.append("")
+
+        return "\n".join(lines) + "\n"
+
+    def get_distinct_values(self, field):
+        """Return the sorted, unique values of a Task field.
+
+        The values are found with a skip-scan: a recursive query
+        that looks up the smallest value in the field's index and
+        then the next value after each one it finds. That costs one
+        index search per distinct value instead of a walk over
+        every task. With the archive included there's no single
+        index to search, so it's a SELECT DISTINCT over both tables.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.get_distinct_values(Task.minutes)
+        [20, 30]
+
+        """
+
+        field = getattr(self.lookup_model(), field.name)
+        if self.include_archive:
+            query = (self.select_tasks(field)
+                     .distinct()
+                     .order_by(field)
+                     .tuples())
+            return [row[0] for row in query]
+
+        values = (self.Task
+                  .select(fn.MIN(field).alias("value"))
+                  .cte("distinct_values", recursive=True,
+                       columns=("value",)))
+        next_value = (self.Task
+                      .select(fn.MIN(field))
+                      .where(field > values.c.value))
+        values = values.union_all(
+            Select([values], [next_value])
+            .where(values.c.value.is_null(False)))
+        query = (values
+                 .select_from(values.c.value)
+                 .where(values.c.value.is_null(False))
+                 .tuples())
+        return [field.python_value(row[0])
+                for row in query.execute(self.db)]
+
+    def get_employee_ids(self, names):
+        """Return a dict of the employee ids for some names, adding
+        the names that aren't in the employee table yet.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> sorted(wl.get_employee_ids(["Bob", "Alex"]).items())
+        [('Alex', 2), ('Bob', 1)]
+        >>> wl.get_employee_ids(["Alex"])
+        {'Alex': 2}
+
+        """
+
+        employee_ids = {}
+        missing_names = []
+
+        for name in names:
+            if name in self.employee_ids:
+                employee_ids[name] = self.employee_ids[name]
+            else:
+                missing_names.append(name)
+
+        for chunk in chunked(missing_names, ROWS_PER_INSERT):
+            (self.Employee
+             .insert_many([(name,) for name in chunk],
+                          fields=[self.Employee.name])
+             .on_conflict_ignore()
+             .execute())
+            employee_ids.update(
+                self.Employee
+                .select(self.Employee.name, self.Employee.id)
+                .where(self.Employee.name.in_(chunk))
+                .tuples())
+
+        return employee_ids
+
+    def get_list_of_dates(self):
+        """Return a list of the dates in the database
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.get_list_of_dates()
+        [datetime.date(2016, 10, 21), datetime.date(2017, 1, 1)]
+        """
+
+        self.menu_choices["date"] = self.get_distinct_values(self.Task.date)
+        return self.menu_choices["date"]
+
+    def get_list_of_employees(self):
+        """Return a list of the employees in the database. The
+        names come from the employee table, which has a row per
+        employee instead of one per task.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> employee_list = wl.get_list_of_employees()
+        >>> employee_list[0]
+        'Alex'
+        >>> employee_list[1]
+        'Bob'
+
+        """
+
+        query = self.Employee.select(self.Employee.name)
+        if not self.include_archive:
+            # Leave out employees whose tasks are all archived.
+            query = query.where(fn.EXISTS(
+                self.Task.select(SQL("1"))
+                .where(self.Task.employee == self.Employee.id)))
+
+        self.menu_choices["employee"] = [
+            row[0] for row in query.order_by(self.Employee.name).tuples()]
+        return self.menu_choices["employee"]
+
+    def get_list_of_times(self):
+        """Return a list of the times that tasks took.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> times = wl.get_list_of_times()
+        >>> times[0]
+        20
+        >>> len(times)
+        2
+        >>> wl.add_task({"employee": "Bob", "task": "Quick fix", \
+        "minutes": 5, "notes": "", "date": "2017-01-02"})
+        >>> wl.get_list_of_times()
+        [5, 20, 30]
+
+        """
+
+        self.menu_choices["time"] = self.get_distinct_values(self.Task.minutes)
+        return self.menu_choices["time"]
+
+    def get_menu_choice(self, menu, choice_number):
+        """Turn the number picked from a selection menu back into
+        the value it stands for, using the list the menu was
+        shown with.
+
+        >>> wl = Worklog()
+        >>> wl.menu_choices["employee"] = ["Alex", "Bob"]
+        >>> wl.get_menu_choice("employee", "2")
+        'Bob'
+
+        """
+
+        return self.get_menu_choices(menu)[int(choice_number) - 1]
+
+    def get_menu_choices(self, menu):
+        """Return the choice list a selection menu was last shown
+        with. The list is only read from the database if the menu
+        hasn't been shown yet.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.get_menu_choices("time")
+        [20]
+        >>> wl.menu_choices["time"] = [20, 30]
+        >>> wl.get_menu_choices("time")
+        [20, 30]
+
+        """
+
+        if menu not in self.menu_choices:
+            list_methods = {
+                "date": self.get_list_of_dates,
+                "employee": self.get_list_of_employees,
+                "time": self.get_list_of_times
+            }
+            list_methods[menu]()
+
+        return self.menu_choices[menu]
+
+    def get_minutes_totals(self, period=None, employee=None, start=None,
+                           end=None):
+        """Return the total minutes spent by each employee, as a
+        list of (employee, period, minutes) tuples.
+
+        period is "day", "week", "month" or None to total the whole
+        range. start and end are optional dates (inclusive) that
+        limit the tasks counted. The totals are computed with a
+        GROUP BY in the database and read from the covering
+        (date, employee, minutes) index.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-11-01"})
+        >>> wl.get_minutes_totals()
+        [('Alex', None, 60), ('Bob', None, 20)]
+        >>> wl.get_minutes_totals("month", employee="Alex")
+        [('Alex', '2016-10', 30), ('Alex', '2016-11', 30)]
+        >>> wl.get_minutes_totals("week", start="2016-10-25")
+        [('Alex', '2016-W44', 30), ('Bob', '2017-W00', 20)]
+        >>> wl.get_minutes_totals("day", end="not a date")
+        Traceback (most recent call last):
+        ...
+        ValueError: Dates must be in the YYYY-MM-DD format.
+        >>> wl.get_minutes_totals("year")
+        Traceback (most recent call last):
+        ...
+        ValueError: The period must be day, week or month.
+
+        """
+
+        if period is not None and period not in TOTALS_PERIOD_FORMATS:
+            raise ValueError("The period must be day, week or month.")
+
+        LookupTask = self.lookup_model()
+        if period is None:
+            period_column = Value(None)
+        else:
+            period_column = fn.strftime(
+                TOTALS_PERIOD_FORMATS[period], LookupTask.date)
+
+        query = (self.tasks_query(employee=employee, start=start, end=end)
+                 .select(self.Employee.name,
+                         period_column.alias("period"),
+                         fn.SUM(LookupTask.minutes).alias("minutes"))
+                 .group_by(self.Employee.name, SQL("period"))
+                 .order_by(self.Employee.name, SQL("period")))
+
+        return list(query.tuples())
+
+    def get_page_of_tasks(self, query, after=None, limit=None):
+        """Return a page of the tasks from a query, ordered by date
+        and then id.
+
+        Paging uses a keyset cursor instead of an offset: after
+        is the (date, id) of the last task on the previous page,
+        which next_page_cursor returns, and limit is the page size.
+        Each page is an index range scan that starts where the
+        last one stopped, so later pages cost the same as the first.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> tasks = wl.get_page_of_tasks(wl.tasks_query(), limit=2)
+        >>> [task["task"] for task in tasks]
+        ['Alex top task', 'Another task']
+        >>> tasks = wl.get_page_of_tasks( \
+        wl.tasks_query(), after=wl.next_page_cursor(tasks), limit=2)
+        >>> [task["task"] for task in tasks]
+        ['Make stuff']
+
+        """
+
+        LookupTask = self.lookup_model()
+        query = query.order_by(LookupTask.date, LookupTask.id)
+
+        if after is not None:
+            after_date, after_id = after
+            query = query.where(
+                Tuple(LookupTask.date, LookupTask.id) >
+                Tuple(LookupTask.date.db_value(after_date), after_id))
+        if limit is not None:
+            query = query.limit(limit)
+
+        return self.get_tasks_from_query(query)
+
+    def get_tasks_from_query(self, query):
+        """Return the tasks from a query as a list of TaskRecords.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> tasks = wl.get_tasks_from_query(wl.tasks_query())
+        >>> sorted(tasks[0].keys())
+        ['date', 'employee', 'id', 'minutes', 'notes', 'task']
+
+        """
+
+        columns = self.task_columns(TaskRecord._fields)
+        return list(map(TaskRecord._make, query.select(*columns).tuples()))
+
+    def format_totals_table(self, totals):
+        """Build a table of the rows from get_minutes_totals
+
+        >>> wl = Worklog()
+        >>> print(wl.format_totals_table( \
+        [("Alex", "2016-10", 90), ("Bob", "2017-01", 20)]), end="")
+        Employee              Period          Minutes    Hours
+        Alex                  2016-10              90      1.5
+        Bob                   2017-01              20      0.3
+        >>> print(wl.format_totals_table([("Alex", None, 60)]), end="")
+        Employee              Period          Minutes    Hours
+        Alex                  All                  60      1.0
+
+        """
+
+        row_format = "{:<22}{:<12}{:>11}{:>9}"
+        lines = [row_format.format("Employee", "Period", "Minutes", "Hours")]
+
+        for employee, period, minutes in totals:
+            lines.append(row_format.format(
+                employee, period or "All", minutes,
+                "{:.1f}".format(minutes / 60)))
+
+        return "\n".join(lines) + "\n"
+
+    def get_tasks_between(self, start, end, after=None, limit=None):
+        """Return the tasks from start to end (inclusive), oldest
+        first. The dates are found with a range scan of the date
+        index. See get_page_of_tasks for the after and limit paging
+        arguments.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-11-01"})
+        >>> tasks = wl.get_tasks_between("2016-10-21", "2016-12-31")
+        >>> [task["task"] for task in tasks]
+        ['Alex top task', 'Another task']
+        >>> wl.get_tasks_between("2016-01-01", "yesterday")
+        Traceback (most recent call last):
+        ...
+        ValueError: Dates must be in the YYYY-MM-DD format.
+
+        """
+
+        return self.get_page_of_tasks(
+            self.tasks_query(start=start, end=end), after, limit)
+
+    def get_tasks_by_search(self, search_term, after=None, limit=None):
+        """Get the tasks for a given search term
+
+        When full-text search is available the results are ranked
+        by relevance. Quoted phrases and prefix searches (e.g. tas*)
+        are supported. Otherwise the task names and notes are
+        checked for the term as a substring.
+
+        The results aren't in date order, so they're paged by
+        position: after is the number of tasks already shown and
+        limit is the page size. Ranking needs every match anyway,
+        so a later page costs about the same as the first.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> tasks = wl.get_tasks_by_search("task")
+        >>> len(tasks)
+        2
+        >>> tasks[0]["employee"]
+        'Alex'
+        >>> tasks = wl.get_tasks_by_search("stuff")
+        >>> len(tasks)
+        3
+        >>> tasks = wl.get_tasks_by_search('"stuff here too"')
+        >>> len(tasks)
+        2
+        >>> tasks = wl.get_tasks_by_search("ano*")
+        >>> tasks[0]["task"]
+        'Another task'
+        >>> [task["task"] for task in \
+        wl.get_tasks_by_search("stuff", after=1, limit=1)]
+        ['Another task']
+        >>> wl.full_text_search = False
+        >>> tasks = wl.get_tasks_by_search("nother")
+        >>> tasks[0]["task"]
+        'Another task'
+        """
+
+        query = self.search_tasks_query(search_term)
+        if limit is not None:
+            query = query.limit(limit)
+        if after is not None:
+            query = query.offset(after)
+
+        return self.get_tasks_from_query(query)
+
+    def get_tasks_for_date(self, date_number, after=None, limit=None):
+        """Return the tasks for a given date. See get_page_of_tasks
+        for the after and limit paging arguments.
 
         >>> wl = Worklog()
         >>> wl.connect_to_database(":memory:")
@@ -378,25 +2177,669 @@ class Worklog:
 
         """
 
-        date_list = self.get_list_of_dates()
-        date_index = int(date_number) - 1
-        date_string = date_list[date_index]
+        date_string = self.get_menu_choice("date", date_number)
+
+        return self.get_page_of_tasks(
+            self.tasks_query(date=date_string), after, limit)
+
+    def get_tasks_for_time(self, time_number, after=None, limit=None):
+        """Return the tasks that took a specific amount of time.
+        See get_page_of_tasks for the after and limit paging arguments.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> tasks = wl.get_tasks_for_time(1)
+        >>> tasks[0]["task"]
+        'Make stuff'
+
+        """
+
+        time_string = self.get_menu_choice("time", time_number)
+
+        return self.get_page_of_tasks(
+            self.tasks_query(minutes=time_string), after, limit)
+
+    def get_tasks_for_employee(self, employee_number, after=None,
+                               limit=None):
+        """Return the tasks for a given emplyee, oldest first.
+        See get_page_of_tasks for the after and limit paging arguments.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> tasks = wl.get_tasks_for_employee("2")
+        >>> tasks[0]["task"]
+        'Make stuff'
+        >>> tasks = wl.get_tasks_for_employee("1")
+        >>> tasks[0]["task"]
+        'Alex top task'
+        >>> tasks[1]["task"]
+        'Another task'
+        >>> tasks[1]["employee"]
+        'Alex'
+        >>> tasks[1]["minutes"]
+        30
+        >>> tasks[1]["date"]
+        datetime.date(2016, 10, 21)
+        >>> tasks[1]["notes"]
+        'Good stuff here too'
+        >>> tasks = wl.get_tasks_for_employee("1", limit=1)
+        >>> tasks[0]["task"]
+        'Alex top task'
+        >>> tasks = wl.get_tasks_for_employee( \
+        "1", after=wl.next_page_cursor(tasks), limit=1)
+        >>> tasks[0]["task"]
+        'Another task'
+        >>> wl.get_tasks_for_employee("1", after=wl.next_page_cursor(tasks))
+        []
+        """
+
+        employee_name = self.get_menu_choice("employee", employee_number)
+
+        return self.get_page_of_tasks(
+            self.tasks_query(employee=employee_name), after, limit)
+
+    def get_total_number_of_tasks(self):
+        """Figure out how many tasks are in the database.
+        Used to determine if lookups should be allowed. (i.e.
+        there is no need to present the lookups if there are
+        no tasks in the database.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.get_total_number_of_tasks()
+        0
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.get_total_number_of_tasks()
+        3
+
+        """
+        return self.select_tasks().count()
+
+    def how_to_find_previous_entries_prompt(self):
+        """Prompt for how to search for previous entries
+
+        >>> wl = Worklog()
+        >>> wl.how_to_find_previous_entries_prompt()
+        'How do you want to find previous entries?\\n1 = By Employee\\n2 = By Date\\n3 = By Search Term'
+
+        """
+        return "How do you want to find previous entries?\n1 = By Employee\n2 = By Date\n3 = By Search Term"
+
+    def import_tasks(self, file_name):
+        """Add the entries from a CSV or JSON Lines file.
+
+        CSV files need a header row with the employee, task,
+        minutes, notes and date columns. JSON Lines files have
+        one object with the same keys per line. Lines that aren't
+        valid JSON are skipped like entries that aren't valid.
+        Returns the number of entries added and skipped.
+
+        >>> import tempfile
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     csv_name = os.path.join(directory, "tasks.csv")
+        ...     with open(csv_name, "w") as csv_file:
+        ...         _ = csv_file.write("employee,task,minutes,notes,date\\n"
+        ...                            "Bob,Make stuff,20,,2017-01-01\\n"
+        ...                            "Alex,Alex top task,x,,2016-10-21\\n")
+        ...     jsonl_name = os.path.join(directory, "tasks.jsonl")
+        ...     with open(jsonl_name, "w") as jsonl_file:
+        ...         _ = jsonl_file.write(
+        ...             '{"employee": "Alex", "task": "Another task", '
+        ...             '"minutes": 30, "date": "2016-10-21"}\\n'
+        ...             '{"employee": "Alex", "task": \\n')
+        ...     wl.import_tasks(csv_name)
+        ...     wl.import_tasks(jsonl_name)
+        (1, 1)
+        (1, 1)
+        >>> wl.get_list_of_employees()
+        ['Alex', 'Bob']
+
+        """
+
+        with open(file_name, newline="") as import_file:
+            if file_name.lower().endswith(".csv"):
+                import csv
+
+                rows = csv.DictReader(import_file)
+            else:
+                import json
+
+                def json_rows():
+                    for line in import_file:
+                        if line.strip():
+                            try:
+                                yield json.loads(line)
+                            except ValueError:
+                                # add_tasks counts it as skipped.
+                                yield None
+
+                rows = json_rows()
+            return self.add_tasks(rows)
+
+    def instrument_database(self, database):
+        """Time every statement run on a database connection in
+        self.stats, and log the ones slower than slow_query_ms.
+        """
+
+        execute_sql = database.execute_sql
+        stats = self.stats
+        slow_query_ms = self.slow_query_ms
+        log_file = self.slow_query_log
+
+        def timed_execute_sql(sql, params=None, *args, **kwargs):
+            start_time = perf_counter()
+            cursor = execute_sql(sql, params, *args, **kwargs)
+            elapsed = perf_counter() - start_time
+            stats.record("sql", elapsed)
+
+            if elapsed * 1000 >= slow_query_ms:
+                lines = ["slow query ({:.1f} ms): {}".format(
+                    elapsed * 1000, sql),
+                    "  params: {!r}".format(params)]
+                if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    plan = execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+                    for row in plan.fetchall():
+                        lines.append("  plan: {}".format(row[-1]))
+                log_file.write("\n".join(lines) + "\n")
+
+            return cursor
+
+        database.execute_sql = timed_execute_sql
+
+    def instrument_method(self, name):
+        """Return a version of one of this work log's methods that
+        records how long each call takes in self.stats.
+        """
+
+        method = getattr(self, name)
+        stats = self.stats
+
+        def timed_method(*args, **kwargs):
+            start_time = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.record(name, perf_counter() - start_time)
+
+        timed_method.__name__ = name
+        timed_method.__doc__ = method.__doc__
+        return timed_method
+
+    def insert_rows(self, rows):
+        """Insert already validated rows in a single transaction,
+        using multi-row inserts. The rows have employee names,
+        which are added to the employee table if they're new and
+        stored as the employees' ids.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.insert_rows([{"employee": "Bob", "task": "Make stuff", \
+        "minutes": 10, "notes": "", "date": "2017-01-01"}])
+        >>> wl.get_total_number_of_tasks()
+        1
+
+        """
+
+        with self.db.atomic():
+            employee_ids = self.get_employee_ids(
+                set(row["employee"] for row in rows))
+            rows = [dict(row, employee=employee_ids[row["employee"]])
+                    for row in rows]
+            for insert_rows in chunked(rows, ROWS_PER_INSERT):
+                self.Task.insert_many(insert_rows).execute()
+
+        # Only remembered once they're committed.
+        self.employee_ids.update(employee_ids)
+
+    def lookup_model(self):
+        """Return the model lookups read from: the task table, or
+        the task table and the archive if include_archive is set.
+        """
+        if self.include_archive:
+            return self.AllTasks
+        return self.Task
+
+    def make_http_server(self, host="127.0.0.1", port=8000,
+                         log_requests=True):
+        """Return a threaded HTTP server that offers the work log as
+        a JSON service. Call serve_forever() on it to start serving.
+
+            GET  /tasks      tasks in date order as JSON Lines, with
+                             the tasks_query filters as parameters
+                             (employee, date, minutes, search, start
+                             and end)
+            GET  /search?q=  the tasks_query search results, best
+                             match first, as JSON Lines
+            GET  /employees, /dates, /times
+                             the menu lists as JSON arrays
+            GET  /totals     get_minutes_totals as a JSON array, with
+                             period, employee, start and end
+                             parameters
+            POST /tasks      add a JSON task object, or an array of
+                             them, with add_tasks
+
+        Each request runs on its own thread. JSON Lines results are
+        streamed from the database cursor with chunked transfer
+        encoding. A work log that's made with a pool_size hands its
+        connection back to the pool after every request. Errors get
+        a 500 response, or the connection is closed if the response
+        has already started.
+
+        >>> import json
+        >>> import tempfile
+        >>> import threading
+        >>> from urllib.request import Request, urlopen
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> wl = Worklog(os.path.join(directory.name, "test.db"),
+        ...              pool_size=2)
+        >>> wl.build_database_tables()
+        True
+        >>> wl.db.close()
+        True
+        >>> server = wl.make_http_server(port=0, log_requests=False)
+        >>> thread = threading.Thread(target=server.serve_forever)
+        >>> thread.start()
+        >>> url = "http://127.0.0.1:{}".format(server.server_address[1])
+        >>> request = Request(url + "/tasks", method="POST", data=json.dumps(
+        ...     [{"employee": "Bob", "task": "Make stuff", "minutes": 20,
+        ...       "notes": "Good stuff here", "date": "2017-01-01"},
+        ...      {"employee": "Alex", "task": "Alex top task", "minutes": 30,
+        ...       "notes": "", "date": "2016-10-21"}]).encode())
+        >>> json.load(urlopen(request))
+        {'added': 2, 'skipped': 0}
+        >>> print(urlopen(url + "/tasks?employee=Bob").read().decode(), end="")
+        {"employee": "Bob", "task": "Make stuff", "minutes": 20, \
+"notes": "Good stuff here", "date": "2017-01-01"}
+        >>> print(urlopen(url + "/search?q=stuff").read().decode(), end="")
+        {"employee": "Bob", "task": "Make stuff", "minutes": 20, \
+"notes": "Good stuff here", "date": "2017-01-01"}
+        >>> json.load(urlopen(url + "/employees"))
+        ['Alex', 'Bob']
+        >>> json.load(urlopen(url + "/totals?period=month&employee=Alex"))
+        [{'employee': 'Alex', 'period': '2016-10', 'minutes': 30}]
+        >>> urlopen(url + "/tasks?start=yesterday")
+        Traceback (most recent call last):
+        ...
+        urllib.error.HTTPError: HTTP Error 400: Bad Request
+        >>> wl.db.close_all()
+        >>> wl.attach_archive(os.path.join(directory.name, "archive.db"),
+        ...                   include_archive=True)
+        >>> wl.archive_tasks("2017-01-02")
+        1
+        >>> wl.db.close()
+        True
+        >>> print(urlopen(url + "/search?q=stuff").read().decode(), end="")
+        {"employee": "Bob", "task": "Make stuff", "minutes": 20, \
+"notes": "Good stuff here", "date": "2017-01-01"}
+        >>> def fail(*args, **kwargs):
+        ...     raise OperationalError("database is locked")
+        >>> wl.get_list_of_times = wl.export_tasks = fail
+        >>> urlopen(url + "/times")
+        Traceback (most recent call last):
+        ...
+        urllib.error.HTTPError: HTTP Error 500: Internal Server Error
+        >>> urlopen(url + "/tasks").read()
+        Traceback (most recent call last):
+        ...
+        http.client.IncompleteRead: IncompleteRead(0 bytes read)
+        >>> server.shutdown()
+        >>> thread.join()
+        >>> server.server_close()
+        >>> wl.db.close_all()
+        >>> directory.cleanup()
+
+        """
+
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlparse
+        import json
+
+        worklog = self
+
+        class ChunkedWriter:
+            """Buffers text written to it and sends it as HTTP/1.1
+            chunks.
+            """
+
+            def __init__(self, stream):
+                self.stream = stream
+                self.buffer = []
+                self.buffered_size = 0
+
+            def write(self, text):
+                self.buffer.append(text)
+                self.buffered_size += len(text)
+                if self.buffered_size >= SERVER_CHUNK_SIZE:
+                    self.flush()
+
+            def flush(self):
+                if self.buffer:
+                    data = "".join(self.buffer).encode("utf-8")
+                    self.stream.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.buffer = []
+                    self.buffered_size = 0
+
+            def close(self):
+                self.flush()
+                self.stream.write(b"0\r\n\r\n")
+
+        class WorklogRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, so without
+            # this small responses wait on delayed ACKs.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                routes = {
+                    "/tasks": self.get_tasks,
+                    "/search": self.search_tasks,
+                    "/employees": worklog.get_list_of_employees,
+                    "/dates": worklog.get_list_of_dates,
+                    "/times": worklog.get_list_of_times,
+                    "/totals": self.get_totals
+                }
+                self.route(routes)
+
+            def do_POST(self):
+                self.route({"/tasks": self.add_tasks})
+
+            def route(self, routes):
+                url = urlparse(self.path)
+                self.parameters = {
+                    name: values[-1]
+                    for name, values in parse_qs(url.query).items()}
+                self.response_started = False
+
+                try:
+                    if url.path not in routes:
+                        self.send_json({"error": "Not found"}, 404)
+                    else:
+                        result = routes[url.path]()
+                        if result is not None:
+                            self.send_json(result, default=str)
+                except Exception as error:
+                    if self.response_started:
+                        # Too late for an error status. Closing the
+                        # connection without the last chunk tells
+                        # the client the response is incomplete.
+                        self.log_error("%s failed: %r", url.path, error)
+                        self.close_connection = True
+                    elif isinstance(error, ValueError):
+                        self.send_json({"error": str(error)}, 400)
+                    else:
+                        self.log_error("%s failed: %r", url.path, error)
+                        self.send_json({"error": "Server error"}, 500)
+                finally:
+                    worklog.db.close()
+
+            def send_json(self, result, status=200, **json_options):
+                body = json.dumps(result, **json_options).encode("utf-8")
+                self.response_started = True
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def start_json_lines(self):
+                self.response_started = True
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                return ChunkedWriter(self.wfile)
+
+            def task_filters(self):
+                filters = {
+                    name: self.parameters.get(name)
+                    for name in ("employee", "date", "start", "end")}
+                filters["search_term"] = self.parameters.get("search")
+                if "minutes" in self.parameters:
+                    filters["minutes"] = int(self.parameters["minutes"])
+                return filters
+
+            def get_tasks(self):
+                filters = self.task_filters()
+                # Check the filters before the response has started.
+                worklog.tasks_query(**filters)
+                writer = self.start_json_lines()
+                worklog.export_tasks(writer, "jsonl", **filters)
+                writer.close()
+
+            def search_tasks(self):
+                search_term = self.parameters.get("q", "")
+                writer = self.start_json_lines()
+                rows = (worklog.search_tasks_query(search_term)
+                        .select(*worklog.task_columns(TASK_FILE_FIELDS))
+                        .tuples()
+                        .iterator())
+                for row in rows:
+                    writer.write(json.dumps(
+                        dict(zip(TASK_FILE_FIELDS, row)), default=str) + "\n")
+                writer.close()
+
+            def get_totals(self):
+                totals = worklog.get_minutes_totals(
+                    self.parameters.get("period"),
+                    employee=self.parameters.get("employee"),
+                    start=self.parameters.get("start"),
+                    end=self.parameters.get("end"))
+                return [{"employee": employee,
+                         "period": period,
+                         "minutes": minutes}
+                        for employee, period, minutes in totals]
+
+            def add_tasks(self):
+                length = int(self.headers.get("Content-Length", 0))
+                tasks = json.loads(self.rfile.read(length) or "null")
+                if isinstance(tasks, dict):
+                    tasks = [tasks]
+                if not isinstance(tasks, list):
+                    raise ValueError("Send a task object or a list of them.")
+                added, skipped = worklog.add_tasks(tasks)
+                self.send_json({"added": added, "skipped": skipped},
+                               201 if added else 400)
+
+            def log_message(self, format, *args):
+                if log_requests:
+                    super().log_message(format, *args)
+
+        return ThreadingHTTPServer((host, port), WorklogRequestHandler)
+
+    def migrate_to_employee_table(self, schema="main",
+                                  batch_size=MIGRATION_BATCH_ROWS):
+        """Move a task table from before the employee table existed,
+        which kept each task's employee name in an employee column,
+        over to employee ids. Returns the number of tasks migrated.
+
+        The names are added to the employee table, and the tasks
+        are copied to a new table batch_size at a time, one
+        transaction per batch, which then replaces the old table.
+        If the migration is interrupted it picks up after the last
+        copied batch the next time. Task ids don't change, so the
+        search index stays valid. schema is "main", or the archive
+        schema to migrate an archive.
+
+        >>> wl = Worklog(":memory:")
+        >>> cursor = wl.db.execute_sql(
+        ...     'CREATE TABLE task (id INTEGER NOT NULL PRIMARY KEY, '
+        ...     'date DATE NOT NULL, employee VARCHAR(255) NOT NULL, '
+        ...     'minutes INTEGER NOT NULL, notes TEXT NOT NULL, '
+        ...     'task VARCHAR(255) NOT NULL)')
+        >>> cursor = wl.db.execute_sql(
+        ...     "INSERT INTO task VALUES "
+        ...     "(1, '2017-01-01', 'Bob', 20, 'Good stuff here', 'Stuff'), "
+        ...     "(2, '2016-10-21', 'Alex', 30, '', 'Alex top task'), "
+        ...     "(3, '2016-10-22', 'Bob', 10, '', 'More stuff')")
+        >>> wl.db.create_tables([wl.Employee])
+        >>> wl.migrate_to_employee_table(batch_size=2)
+        3
+        >>> wl.build_database_tables()
+        True
+        >>> wl.get_list_of_employees()
+        ['Alex', 'Bob']
+        >>> [task["task"] for task in wl.get_tasks_for_employee(2)]
+        ['More stuff', 'Stuff']
+        >>> wl.migrate_to_employee_table()
+        0
+
+        """
+
+        table_name = self.Task._meta.table_name
+        column_names = [
+            column.name for column in self.db.get_columns(table_name, schema)]
+        if "employee" not in column_names:
+            return 0
+
+        worklog_database = self.db
+        migration_schema = None if schema == "main" else schema
+        migration_table_name = table_name + "_migration"
+
+        class MigratedTask(self.Task):
+            class Meta:
+                database = worklog_database
+                schema = migration_schema
+                table_name = migration_table_name
+
+        employee_table = self.Employee._meta.table_name
+        old_table = '"{}"."{}"'.format(schema, table_name)
+        new_table = '"{}"."{}"'.format(schema, MigratedTask._meta.table_name)
+
+        def add_employees():
+            self.db.execute_sql(
+                'INSERT OR IGNORE INTO "main"."{}" (name) '
+                'SELECT DISTINCT employee FROM {}'.format(
+                    employee_table, old_table))
+
+        def copy_batch(after_id):
+            return self.db.execute_sql(
+                'INSERT INTO {} (id, date, employee_id, minutes, notes, task) '
+                'SELECT t.id, t.date, e.id, t.minutes, t.notes, t.task '
+                'FROM {} AS t JOIN "main"."{}" AS e ON e.name = t.employee '
+                'WHERE t.id > ? ORDER BY t.id LIMIT ?'.format(
+                    new_table, old_table, employee_table),
+                (after_id, batch_size)).rowcount
+
+        def replace_old_table():
+            with self.db.atomic():
+                self.db.execute_sql("DROP TABLE {}".format(old_table))
+                self.db.execute_sql('ALTER TABLE {} RENAME TO "{}"'.format(
+                    new_table, table_name))
+
+        self.run_write(add_employees)
+        MigratedTask._schema.create_table(safe=True)
+
+        migrated = 0
+        while True:
+            last_id = MigratedTask.select(
+                fn.COALESCE(fn.MAX(MigratedTask.id), 0)).scalar()
+            copied = self.run_write(copy_batch, last_id)
+            if not copied:
+                break
+            migrated += copied
+
+        self.run_write(replace_old_table)
+        self.tasks_changed()
+        return migrated
+
+    def next_page_cursor(self, tasks):
+        """Return the keyset cursor for the page after a page of
+        tasks, or None if the page was empty.
+
+        >>> import datetime
+        >>> wl = Worklog()
+        >>> wl.next_page_cursor([{"id": 7, "date": datetime.date(2017, 1, 1)}])
+        (datetime.date(2017, 1, 1), 7)
+        >>> wl.next_page_cursor([]) is None
+        True
+
+        """
+
+        if not tasks:
+            return None
 
-        tasks = []
+        return tasks[-1]["date"], tasks[-1]["id"]
 
-        for task_item in Task.select().where(Task.date == date_string):
-            tasks.append({
-                "task": task_item.task,
-                "employee": task_item.employee,
-                "minutes": task_item.minutes,
-                "date": task_item.date,
-                "notes": task_item.notes
-            })
+    def refresh_replica(self):
+        """Copy the whole database into the read replica again.
+        """
 
-        return tasks
+        self.db.connection().backup(self.replica.db.connection())
+        self.replica.check_storage()
+        self.replica.build_database_tables()
+        self.tasks_changed()
 
-    def get_tasks_for_time(self, time_number):
-        """Return the tasks that took a specific amount of time.
+    def run_write(self, write, *args, **kwargs):
+        """Call a function that writes to the database, trying it
+        again with exponential backoff if the database is locked by
+        another connection. SQLite's busy timeout has already waited
+        before the error is raised, so a write is tried at most
+        WRITE_ATTEMPTS times before the error is passed on.
+
+        >>> wl = Worklog()
+        >>> attempts = []
+        >>> def locked_twice():
+        ...     attempts.append(1)
+        ...     if len(attempts) < 3:
+        ...         raise OperationalError("database is locked")
+        ...     return "written"
+        >>> wl.run_write(locked_twice)
+        'written'
+        >>> len(attempts)
+        3
+        >>> def broken():
+        ...     raise OperationalError("no such table: task")
+        >>> wl.run_write(broken)
+        Traceback (most recent call last):
+        ...
+        peewee.OperationalError: no such table: task
+
+        """
+
+        delay = WRITE_RETRY_DELAY
+
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                return write(*args, **kwargs)
+            except OperationalError as error:
+                message = str(error)
+                is_locked = "locked" in message or "busy" in message
+                if not is_locked or attempt == WRITE_ATTEMPTS:
+                    raise
+            sleep(delay)
+            delay *= 2
+
+    def search_tasks_query(self, search_term):
+        """Return the query that finds the tasks matching a search
+        term, using the full-text index when it's available.
 
         >>> wl = Worklog()
         >>> wl.connect_to_database(":memory:")
@@ -404,114 +2847,156 @@ class Worklog:
         True
         >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
         "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
-        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> tasks = wl.get_tasks_for_time(1)
-        >>> tasks[0]["task"]
-        'Make stuff'
+        >>> wl.search_tasks_query("stuff").count()
+        1
+        >>> wl.search_tasks_query("don't").count()
+        0
 
         """
 
-        time_list = self.get_list_of_times()
-        time_index = int(time_number) - 1
-        time_string = time_list[time_index]
+        query = self.tasks_query(search_term=search_term)
+        LookupTask = self.lookup_model()
 
-        tasks = []
+        # The id keeps the order the same from one page to the next.
+        if self.uses_search_index(search_term):
+            return query.order_by(self.TaskSearchIndex.bm25(),
+                                  LookupTask.date.desc(),
+                                  LookupTask.id.desc())
 
-        for task_item in Task.select().where(Task.minutes == time_string):
-            tasks.append({
-                "task": task_item.task,
-                "employee": task_item.employee,
-                "minutes": task_item.minutes,
-                "date": task_item.date,
-                "notes": task_item.notes
-            })
+        return query.order_by(LookupTask.date.desc(), LookupTask.id.desc())
 
-        return tasks
+    def search_match_expression(self, search_term):
+        """Turn a search term into an FTS5 match expression.
 
-    def get_tasks_for_employee(self, employee_number):
-        """Return the tasks for a given emplyee.
+        Quoted phrases are kept together and a word ending in *
+        becomes a prefix search. Everything else is quoted so
+        punctuation in the term can't cause a syntax error.
+        Returns an empty string if there's nothing to search for.
 
         >>> wl = Worklog()
-        >>> wl.connect_to_database(":memory:")
-        >>> wl.build_database_tables()
-        True
-        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
-        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
-        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> tasks = wl.get_tasks_for_employee("2")
-        >>> tasks[0]["task"]
-        'Make stuff'
-        >>> tasks = wl.get_tasks_for_employee("1")
-        >>> tasks[0]["task"]
-        'Alex top task'
-        >>> tasks[1]["task"]
-        'Another task'
-        >>> tasks[1]["employee"]
-        'Alex'
-        >>> tasks[1]["minutes"]
-        30
-        >>> tasks[1]["date"]
-        datetime.date(2016, 10, 21)
-        >>> tasks[1]["notes"]
-        'Good stuff here too'
+        >>> wl.search_match_expression('deploy "release notes" tas*')
+        '"deploy" "release notes" "tas"*'
+        >>> wl.search_match_expression("don't")
+        '"don" "t"'
+        >>> wl.search_match_expression("  ")
+        ''
+
         """
 
-        employee_list = self.get_list_of_employees()
-        employee_index = int(employee_number) - 1
-        employee_name = employee_list[employee_index]
+        terms = []
 
-        tasks = []
+        for phrase, word, prefix in re.findall(
+                r'"([^"]*)"|(\w+)(\*?)', search_term):
+            if phrase.strip():
+                terms.append('"{}"'.format(phrase.strip()))
+            elif word:
+                terms.append('"{}"{}'.format(word, prefix))
 
-        for task_item in Task.select().where(Task.employee == employee_name):
-            tasks.append({
-                "task": task_item.task,
-                "employee": task_item.employee,
-                "minutes": task_item.minutes,
-                "date": task_item.date,
-                "notes": task_item.notes
-            })
+        return " ".join(terms)
 
-        return tasks
+    def select_tasks(self, *fields):
+        """Start a lookup query on the lookup_model. Across the task
+        table and the archive that means selecting from a UNION ALL
+        of the two, which SQLite pushes the query's WHERE clause
+        into so each table's indexes are still used.
 
-    def get_total_number_of_tasks(self):
-        """Figure out how many tasks are in the database.
-        Used to determine if lookups should be allowed. (i.e.
-        there is no need to present the lookups if there are
-        no tasks in the database.
+        >>> wl = Worklog()
+        >>> wl.select_tasks().sql()[0]
+        'SELECT "t1"."id", "t1"."date", "t1"."employee_id", "t1"."minutes", \
+"t1"."notes", "t1"."task" FROM "task" AS "t1"'
+
+        """
 
+        LookupTask = self.lookup_model()
+        query = LookupTask.select(*fields)
+
+        if LookupTask is not self.Task:
+            columns = [getattr(self.Task, name)
+                       for name in TaskRecord._fields]
+            archived_columns = [getattr(self.ArchivedTask, name)
+                                for name in TaskRecord._fields]
+            all_tasks = (self.Task.select(*columns) +
+                         self.ArchivedTask.select(*archived_columns))
+            query = query.with_cte(
+                all_tasks.cte(LookupTask._meta.table_name))
+
+        return query
+
+    def show_paged_report_for_tasks(self, get_page,
+                                    page_size=REPORT_PAGE_SIZE,
+                                    by_position=False):
+        """Print a report one page at a time. get_page is called
+        with the after and limit paging arguments (e.g. a partial
+        of get_tasks_for_employee) and the next page is only fetched
+        if the user asks for it. With by_position, after is the
+        number of tasks already shown (see get_tasks_by_search)
+        instead of a keyset cursor.
+
+        >>> from functools import partial
         >>> wl = Worklog()
         >>> wl.connect_to_database(":memory:")
         >>> wl.build_database_tables()
         True
-        >>> wl.get_total_number_of_tasks()
-        0
         >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
         "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
-        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.add_task({"employee": "Alex", "task": "Another task", \
-        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
-        >>> wl.get_total_number_of_tasks()
-        3
+        >>> wl.add_task({"employee": "Bob", "task": "More stuff", \
+        "minutes": 30, "notes": "Next day", "date": "2017-01-02"})
+        >>> wl.ask_for_input = lambda: ""
+        >>> wl.show_paged_report_for_tasks( \
+        partial(wl.get_tasks_for_employee, "1"), page_size=1)
+        Here are the tasks:
+        <BLANKLINE>
+        ---
+        Employee: Bob
+        Date: 2017-01-01
+        Task: Make stuff
+        Time Spent: 20 min.
+        Notes: Good stuff here
+        <BLANKLINE>
+        Press Enter/Return for more tasks, or q to stop.
+        Here are the tasks:
+        <BLANKLINE>
+        ---
+        Employee: Bob
+        Date: 2017-01-02
+        Task: More stuff
+        Time Spent: 30 min.
+        Notes: Next day
+        <BLANKLINE>
+        >>> wl.ask_for_input = lambda: "q"
+        >>> wl.show_paged_report_for_tasks( \
+        partial(wl.get_tasks_for_employee, "1"), page_size=1)
+        Here are the tasks:
+        <BLANKLINE>
+        ---
+        Employee: Bob
+        Date: 2017-01-01
+        Task: Make stuff
+        Time Spent: 20 min.
+        Notes: Good stuff here
+        <BLANKLINE>
+        Press Enter/Return for more tasks, or q to stop.
 
         """
-        return Task.select().count()
 
-    def how_to_find_previous_entries_prompt(self):
-        """Prompt for how to search for previous entries
+        after = None
 
-        >>> wl = Worklog()
-        >>> wl.how_to_find_previous_entries_prompt()
-        'How do you want to find previous entries?\\n1 = By Employee\\n2 = By Date\\n3 = By Search Term'
+        while True:
+            # Ask for one extra task to find out if there's another page.
+            tasks = get_page(after=after, limit=page_size + 1)
+            page = tasks[:page_size]
+            self.show_report_for_tasks(page)
 
-        """
-        return "How do you want to find previous entries?\n1 = By Employee\n2 = By Date\n3 = By Search Term"
+            if len(tasks) <= page_size:
+                return
+
+            print("Press Enter/Return for more tasks, or q to stop.")
+            if self.ask_for_input().lower() == "q":
+                return
+            if by_position:
+                after = (after or 0) + len(page)
+            else:
+                after = self.next_page_cursor(page)
 
     def show_report_for_tasks(self, tasks):
         """Print out the report for a set of tasks
@@ -557,16 +3042,197 @@ class Worklog:
         <BLANKLINE>
         """
 
-        print("Here are the tasks:\n")
+        self.write_output(self.format_report_for_tasks(tasks))
 
-        for task in tasks:
-            print("---")
-            print("Employee: {}".format(task["employee"]))
-            print("Date: {}".format(task["date"]))
-            print("Task: {}".format(task["task"]))
-            print("Time Spent: {} min.".format(task["minutes"]))
-            print("Notes: {}".format(task["notes"]))
-            print("")
+    def start_write_timer(self):
+        """Flush the write buffer from a background thread once the
+        first task in it has waited write_buffer_seconds.
+        """
+
+        def flush_on_time():
+            try:
+                self.flush_writes()
+            finally:
+                self.db.close()
+
+        timer = threading.Timer(self.write_buffer_seconds, flush_on_time)
+        # Tasks still buffered at exit are written by the atexit hook.
+        timer.daemon = True
+        timer.start()
+
+    def sync_replica(self):
+        """Copy the employees and tasks that were added to the
+        database since the read replica was last refreshed or
+        synced into the replica.
+        """
+
+        copies = [
+            (self.Employee._meta.table_name, ["id", "name"]),
+            (self.Task._meta.table_name,
+             ["id", "date", "employee_id", "minutes", "notes", "task"])
+        ]
+
+        def copy_new_rows():
+            with self.replica.db.atomic():
+                for table_name, columns in copies:
+                    last_id = self.replica.db.execute_sql(
+                        'SELECT COALESCE(MAX(id), 0) FROM "{}"'.format(
+                            table_name)).fetchone()[0]
+                    rows = self.db.execute_sql(
+                        'SELECT {} FROM "{}" WHERE id > ? ORDER BY id'.format(
+                            ", ".join(columns), table_name),
+                        (last_id,)).fetchall()
+                    self.replica.db.cursor().executemany(
+                        'INSERT INTO "{}" ({}) VALUES ({})'.format(
+                            table_name, ", ".join(columns),
+                            ", ".join("?" * len(columns))),
+                        rows)
+
+        self.replica.run_write(copy_new_rows)
+        self.tasks_changed()
+
+    def task_columns(self, names):
+        """Return the columns to select for some TaskRecord fields
+        from a tasks_query, with the employee's name for employee.
+
+        >>> wl = Worklog()
+        >>> wl.task_columns(["employee", "minutes"]) == \
+        [Employee.name, Task.minutes]
+        True
+
+        """
+
+        LookupTask = self.lookup_model()
+        return [self.Employee.name if name == "employee"
+                else getattr(LookupTask, name) for name in names]
+
+    def task_row(self, params):
+        """Return the column values for inserting a validated task.
+
+        >>> wl = Worklog()
+        >>> wl.task_row({"employee": "Bob", "task": "Make stuff", \
+        "minutes": "20", "date": "2017-01-01"})["minutes"]
+        20
+
+        """
+
+        return {
+            "employee": params["employee"],
+            "task": params["task"],
+            "minutes": int(params["minutes"]),
+            "notes": params.get("notes") or "",
+            "date": params["date"]
+        }
+
+    def tasks_changed(self):
+        """Note that the tasks in the database have changed, which
+        empties the query caches and the stored menu choice lists.
+        """
+        database_generations[self.db] = (
+            database_generations.get(self.db, 0) + 1)
+        self.menu_choices.clear()
+
+    def tasks_query(self, employee=None, date=None, minutes=None,
+                    search_term=None, start=None, end=None):
+        """Return an unordered query for the tasks that match all of
+        the filters that are given. Filters left as None aren't
+        applied. start and end are inclusive dates. A date, start
+        or end that isn't a YYYY-MM-DD date raises ValueError.
+
+        >>> wl = Worklog()
+        >>> wl.connect_to_database(":memory:")
+        >>> wl.build_database_tables()
+        True
+        >>> wl.add_task({"employee": "Bob", "task": "Make stuff", \
+        "minutes": 20, "notes": "Good stuff here", "date": "2017-01-01"})
+        >>> wl.add_task({"employee": "Alex", "task": "Alex top task", \
+        "minutes": 30, "notes": "Good stuff here too", "date": "2016-10-21"})
+        >>> wl.tasks_query().count()
+        2
+        >>> wl.tasks_query(employee="Alex", minutes=30).count()
+        1
+        >>> wl.tasks_query(date="2017-01-01", search_term="stuff").count()
+        1
+        >>> wl.tasks_query(employee="Bob", search_term="top").count()
+        0
+        >>> wl.tasks_query(start="2016-10-21", end="2016-12-31").count()
+        1
+        >>> wl.tasks_query(start="2016-10-22").count()
+        1
+        >>> wl.tasks_query(date="notadate")
+        Traceback (most recent call last):
+        ...
+        ValueError: Dates must be in the YYYY-MM-DD format.
+
+        """
+
+        for filter_date in (date, start, end):
+            if filter_date is not None and not self.validate_date(
+                    str(filter_date)):
+                raise ValueError("Dates must be in the YYYY-MM-DD format.")
+
+        LookupTask = self.lookup_model()
+        query = (self.select_tasks()
+                 .join(self.Employee,
+                       on=(LookupTask.employee == self.Employee.id))
+                 .switch(LookupTask))
+
+        if start is not None and end is not None:
+            query = query.where(LookupTask.date.between(start, end))
+        elif start is not None:
+            query = query.where(LookupTask.date >= start)
+        elif end is not None:
+            query = query.where(LookupTask.date <= end)
+        if employee is not None:
+            query = query.where(self.Employee.name == employee)
+        if date is not None:
+            query = query.where(LookupTask.date == date)
+        if minutes is not None:
+            query = query.where(LookupTask.minutes == minutes)
+
+        if search_term is not None:
+            if self.uses_search_index(search_term):
+                match_expression = self.search_match_expression(search_term)
+                SearchIndex = self.TaskSearchIndex
+                query = (query
+                         .join(SearchIndex,
+                               on=(LookupTask.id == SearchIndex.rowid))
+                         .where(SearchIndex.match(match_expression)))
+            else:
+                notes = LookupTask.notes
+                if self.compact:
+                    notes = getattr(fn, NOTES_FUNCTION)(notes)
+                query = query.where(LookupTask.task.contains(search_term) |
+                                    notes.contains(search_term))
+
+        return query
+
+    def uses_search_index(self, search_term):
+        """Return True if a search for the term is answered from
+        the full-text search index.
+        """
+        return bool(self.full_text_search and
+                    not self.include_archive and
+                    self.search_match_expression(search_term))
+
+    def uses_compact_storage(self, schema="main"):
+        """Return True if the task table in a schema of the database
+        keeps its dates as day numbers, the way compact storage does.
+
+        >>> wl = Worklog(":memory:")
+        >>> wl.uses_compact_storage()
+        False
+        >>> wl.build_database_tables()
+        True
+        >>> wl.uses_compact_storage()
+        False
+
+        """
+
+        columns = self.db.get_columns(self.Task._meta.table_name, schema)
+        return any(column.name == "date" and
+                   column.data_type.upper() == "INTEGER"
+                   for column in columns)
 
     def validate_date(self, date):
         """Make sure the date is in the proper format
@@ -603,11 +3269,7 @@ class Worklog:
         False
         """
 
-        pattern = re.compile("^[1-{}]$".format(len(self.get_list_of_dates())))
-        if pattern.match(date_number):
-            return True
-        else:
-            return False
+        return self.validate_menu_choice("date", date_number)
 
     def validate_employee_number(self, employee_number):
         """Make sure the employee number is valid
@@ -629,12 +3291,7 @@ class Worklog:
         False
         """
 
-        pattern = re.compile(
-            "^[1-{max}]$".format(max=len(self.get_list_of_employees())))
-        if pattern.match(employee_number):
-            return True
-        else:
-            return False
+        return self.validate_menu_choice("employee", employee_number)
 
     def validate_lookup_type(self, lookup_type):
         """Makes sure that lookup_type is valid
@@ -649,17 +3306,36 @@ class Worklog:
         >>> wl.validate_lookup_type("4")
         True
         >>> wl.validate_lookup_type("5")
+        True
+        >>> wl.validate_lookup_type("6")
         False
         """
 
-        pattern = re.compile("^[1-4]$")
+        pattern = re.compile("^[1-5]$")
         if pattern.match(lookup_type):
             return True
         else:
             return False
 
+    def validate_optional_date(self, date):
+        """Make sure an optional date is either empty or in the
+        proper format
+
+        >>> wl = Worklog()
+        >>> wl.validate_optional_date("")
+        True
+        >>> wl.validate_optional_date("2017-01-02")
+        True
+        >>> wl.validate_optional_date("last week")
+        False
+
+        """
+
+        return date == "" or self.validate_date(date)
+
     def validate_main_prompt_input(self, test_string):
-        """Make sure a value of '1' or '2' was passed
+        """Make sure a value of '1' through '4' was passed, or '5'
+        when there's a read replica to reload.
 
         >>> wl = Worklog()
         >>> wl.validate_main_prompt_input("1")
@@ -668,16 +3344,44 @@ class Worklog:
         True
         >>> wl.validate_main_prompt_input("3")
         True
+        >>> wl.validate_main_prompt_input("4")
+        True
+        >>> wl.validate_main_prompt_input("5")
+        False
         >>> wl.validate_main_prompt_input("asdfasdf")
         False
 
         """
-        pattern = re.compile("^[1-3]$")
+        if self.replica is not None and test_string == "5":
+            return True
+        pattern = re.compile("^[1-4]$")
         if pattern.match(test_string):
             return True
         else:
             return False
 
+    def validate_menu_choice(self, menu, choice_number):
+        """Make sure a number picked from a selection menu is one
+        of the menu's choices. Any number of choices is allowed.
+
+        >>> wl = Worklog()
+        >>> wl.menu_choices["date"] = list(range(12))
+        >>> wl.validate_menu_choice("date", "12")
+        True
+        >>> wl.validate_menu_choice("date", "13")
+        False
+        >>> wl.validate_menu_choice("date", "0")
+        False
+        >>> wl.validate_menu_choice("date", "-1")
+        False
+
+        """
+
+        if not re.match(r"^\d+$", choice_number):
+            return False
+
+        return 1 <= int(choice_number) <= len(self.get_menu_choices(menu))
+
     def validate_minutes(self, minutes_as_string):
         """Make sure the string sent to minutes will
         convert to an integer properly
@@ -739,6 +3443,49 @@ class Worklog:
         else:
             return False
 
+    def validate_task_params(self, params):
+        """Make sure a set of entry params can be added to
+        the database. Notes are optional.
+
+        >>> wl = Worklog()
+        >>> wl.validate_task_params({"employee": "Bob", "task": "Stuff", \
+        "minutes": "20", "date": "2017-01-01"})
+        True
+        >>> wl.validate_task_params({"employee": "Bob", "task": "Stuff", \
+        "minutes": "twenty", "date": "2017-01-01"})
+        False
+        >>> wl.validate_task_params({"employee": "Bob"})
+        False
+
+        """
+
+        try:
+            return (self.validate_name(params["employee"]) and
+                    self.validate_task(params["task"]) and
+                    self.validate_minutes(str(params["minutes"])) and
+                    self.validate_date(str(params["date"])))
+        except (KeyError, TypeError):
+            return False
+
+    def validate_totals_period(self, period_number):
+        """Make sure the totals period picked is valid
+
+        >>> wl = Worklog()
+        >>> wl.validate_totals_period("1")
+        True
+        >>> wl.validate_totals_period("4")
+        True
+        >>> wl.validate_totals_period("5")
+        False
+
+        """
+
+        pattern = re.compile("^[1-4]$")
+        if pattern.match(period_number):
+            return True
+        else:
+            return False
+
     def validate_time_number(self, time_number):
         """Makes sure that the time requested is valid
 
@@ -757,11 +3504,7 @@ class Worklog:
         False
         """
 
-        pattern = re.compile("^[1-{}]$".format(len(self.get_list_of_times())))
-        if pattern.match(time_number):
-            return True
-        else:
-            return False
+        return self.validate_menu_choice("time", time_number)
 
     def validate_how_to_find_previous_entries_prompt(self, test_string):
         """Make sure the value passed is either a 1, 2, or 3
@@ -784,20 +3527,348 @@ class Worklog:
         else:
             return False
 
+    def write_output(self, text):
+        """Write a block of text to the terminal in one call.
 
-if __name__ == "__main__":
-    import doctest
-    if doctest.testmod().failed:
-        print("--- Tests Failed ---")
-    else:
+        When the output is an interactive terminal and the text
+        is taller than it, the text is shown through a pager.
+
+        >>> wl = Worklog()
+        >>> wl.write_output("Line one\\nLine two\\n")
+        Line one
+        Line two
+
+        """
+
+        if (sys.stdout.isatty() and
+                text.count("\n") >= shutil.get_terminal_size().lines):
+            import pydoc
+
+            pydoc.pager(text)
+        else:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+
+class AsyncWorklog:
+    """Coroutine versions of the Worklog methods for use in an
+    asyncio application.
+
+    Each call runs on a bounded pool of worker threads so a slow
+    query doesn't block the event loop, and up to `workers` calls
+    run at the same time. Every worker thread has its own SQLite
+    connection, which means the database has to be a file: each
+    connection to ":memory:" would see a different database.
+
+    >>> import asyncio
+    >>> import tempfile
+    >>> async def log_and_look_up(database_name):
+    ...     async with AsyncWorklog(database_name) as awl:
+    ...         await awl.build_database_tables()
+    ...         await asyncio.gather(
+    ...             awl.add_task({"employee": "Bob", "task": "Make stuff",
+    ...                           "minutes": 20, "notes": "Good stuff here",
+    ...                           "date": "2017-01-01"}),
+    ...             awl.add_task({"employee": "Alex", "task": "Alex top task",
+    ...                           "minutes": 30, "notes": "",
+    ...                           "date": "2016-10-21"}))
+    ...         return await asyncio.gather(
+    ...             awl.get_list_of_employees(),
+    ...             awl.get_tasks_by_search("stuff"),
+    ...             awl.get_minutes_totals())
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     employees, tasks, totals = asyncio.run(
+    ...         log_and_look_up(os.path.join(directory, "test.db")))
+    >>> employees
+    ['Alex', 'Bob']
+    >>> tasks[0]["task"]
+    'Make stuff'
+    >>> totals
+    [('Alex', None, 30), ('Bob', None, 20)]
+    """
+
+    def __init__(self, database_name, profile="tuned", workers=ASYNC_WORKERS):
+        # Imported here so the command line doesn't pay for them.
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.worklog = Worklog(database_name, profile)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="worklog")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Wait for running calls to finish, write any buffered
+        tasks and stop the workers. Each worker's connection is
+        closed when its thread exits.
+        """
+        await self.run(self.worklog.flush_writes)
+        self.executor.shutdown(wait=True)
+        self.worklog.db.close()
+
+    async def run(self, method, *args, **kwargs):
+        """Run a blocking call on the worker pool and wait for it."""
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(method, *args, **kwargs))
+
+    async def add_task(self, params):
+        return await self.run(self.worklog.add_task, params)
+
+    async def add_tasks(self, tasks, **kwargs):
+        return await self.run(self.worklog.add_tasks, tasks, **kwargs)
+
+    async def build_database_tables(self):
+        return await self.run(self.worklog.build_database_tables)
+
+    async def flush_writes(self):
+        return await self.run(self.worklog.flush_writes)
+
+    async def get_list_of_dates(self):
+        return await self.run(self.worklog.get_list_of_dates)
+
+    async def get_list_of_employees(self):
+        return await self.run(self.worklog.get_list_of_employees)
+
+    async def get_list_of_times(self):
+        return await self.run(self.worklog.get_list_of_times)
 
+    async def get_minutes_totals(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_minutes_totals, *args, **kwargs)
+
+    async def get_tasks(self, after=None, limit=None, **filters):
+        """Return a page of the tasks matching the tasks_query
+        filters. This takes values (e.g. employee="Bob") instead
+        of menu numbers.
+        """
+        return await self.run(
+            lambda: self.worklog.get_page_of_tasks(
+                self.worklog.tasks_query(**filters), after, limit))
+
+    async def get_tasks_between(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_tasks_between, *args, **kwargs)
+
+    async def get_tasks_by_search(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_tasks_by_search, *args, **kwargs)
+
+    async def get_tasks_for_date(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_tasks_for_date, *args, **kwargs)
+
+    async def get_tasks_for_employee(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_tasks_for_employee, *args, **kwargs)
+
+    async def get_tasks_for_time(self, *args, **kwargs):
+        return await self.run(
+            self.worklog.get_tasks_for_time, *args, **kwargs)
+
+    async def get_total_number_of_tasks(self):
+        return await self.run(self.worklog.get_total_number_of_tasks)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    def add_filter_arguments(subparser):
+        subparser.add_argument("--employee")
+        subparser.add_argument("--date")
+        subparser.add_argument("--minutes", type=int)
+        subparser.add_argument("--search", dest="search_term")
+        subparser.add_argument(
+            "--start", help="first date to include (e.g. 2017-01-01)")
+        subparser.add_argument(
+            "--end", help="last date to include (e.g. 2017-01-31)")
+
+    parser = argparse.ArgumentParser(description="Work log with a database")
+    parser.add_argument(
+        "--self-test", action="store_true",
+        help="run the test suite instead of the work log")
+    parser.add_argument(
+        "--database", default="database.db",
+        help="the database file to use (default: database.db)")
+    parser.add_argument(
+        "--profile", choices=sorted(PRAGMA_PROFILES), default="tuned",
+        help="the SQLite settings to use (default: tuned)")
+    parser.add_argument(
+        "--archive", default=ARCHIVE_DATABASE,
+        help="the archive database file "
+             "(default: {})".format(ARCHIVE_DATABASE))
+    parser.add_argument(
+        "--include-archive", action="store_true",
+        help="look up tasks in the archive as well as the database")
+    parser.add_argument(
+        "--replica", action="store_true",
+        help="answer lookups from an in-memory copy of the database, "
+             "which can be reloaded from the main menu")
+    parser.add_argument(
+        "--instrument", action="store_true",
+        help="time the database calls, log slow queries to stderr and "
+             "print the stats on exit (or on SIGUSR1)")
+    parser.add_argument(
+        "--slow-query-ms", type=float, default=SLOW_QUERY_MS,
+        help="with --instrument, log queries slower than this "
+             "(default: {})".format(SLOW_QUERY_MS))
+    subparsers = parser.add_subparsers(dest="command")
+
+    add_parser = subparsers.add_parser(
+        "add", help="add an entry and print the result as JSON")
+    add_parser.add_argument("--employee", required=True)
+    add_parser.add_argument("--task", required=True)
+    add_parser.add_argument("--minutes", required=True)
+    add_parser.add_argument("--notes", default="")
+    add_parser.add_argument(
+        "--date", default=strftime("%Y-%m-%d", gmtime()),
+        help="the date of the entry (default: today)")
+
+    find_parser = subparsers.add_parser(
+        "find", help="print the matching entries as JSON Lines")
+    add_filter_arguments(find_parser)
+
+    report_parser = subparsers.add_parser(
+        "report", help="print minutes totals as JSON Lines")
+    report_parser.add_argument(
+        "--period", choices=sorted(TOTALS_PERIOD_FORMATS),
+        help="total by day, week or month instead of the whole range")
+    report_parser.add_argument("--employee")
+    report_parser.add_argument(
+        "--start", help="first date to include (e.g. 2017-01-01)")
+    report_parser.add_argument(
+        "--end", help="last date to include (e.g. 2017-01-31)")
+
+    import_parser = subparsers.add_parser(
+        "import", help="add the entries from a CSV or JSON Lines file")
+    import_parser.add_argument("file_name")
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="serve the work log as a JSON HTTP service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+
+    export_parser = subparsers.add_parser(
+        "export", help="write entries out as CSV or JSON Lines")
+    export_parser.add_argument(
+        "--format", choices=["csv", "jsonl"], default="csv")
+    add_filter_arguments(export_parser)
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="move older entries to the archive database")
+    archive_parser.add_argument(
+        "--before", required=True,
+        help="archive the entries dated before this (e.g. 2017-01-01)")
+
+    subparsers.add_parser(
+        "compact", help="convert the database to compact storage")
+
+    arguments = parser.parse_args()
+
+    if arguments.self_test:
+        import doctest
+
+        if doctest.testmod().failed:
+            print("--- Tests Failed ---")
+            sys.exit(1)
         print("--- Tests Passed ---")
-        # exit()
+        sys.exit(0)
 
+    if arguments.command == "serve":
+        wl = Worklog(arguments.database, arguments.profile,
+                     pool_size=SERVER_POOL_SIZE)
+    else:
         wl = Worklog()
-        wl.connect_to_database("database.db")
-        wl.build_database_tables()
+        wl.connect_to_database(arguments.database, arguments.profile)
+    if arguments.instrument:
+        wl.enable_instrumentation(arguments.slow_query_ms, dump_on_exit=True)
+    wl.build_database_tables()
+    if arguments.command == "archive" or arguments.include_archive:
+        wl.attach_archive(arguments.archive, arguments.include_archive)
+    if arguments.replica:
+        if arguments.include_archive or arguments.command == "serve":
+            parser.error("--replica can't be used with --include-archive "
+                         "or serve")
+        wl.enable_read_replica()
+
+    if arguments.command == "add":
+        added, skipped = wl.add_tasks([{
+            "employee": arguments.employee,
+            "task": arguments.task,
+            "minutes": arguments.minutes,
+            "notes": arguments.notes,
+            "date": arguments.date
+        }])
+        print(json.dumps({"added": added, "skipped": skipped}))
+        if skipped:
+            sys.exit(1)
+
+    elif arguments.command in ("find", "export"):
+        try:
+            wl.export_tasks(sys.stdout,
+                            getattr(arguments, "format", "jsonl"),
+                            employee=arguments.employee,
+                            date=arguments.date,
+                            minutes=arguments.minutes,
+                            search_term=arguments.search_term,
+                            start=arguments.start,
+                            end=arguments.end)
+        except ValueError as error:
+            parser.error(error)
+
+    elif arguments.command == "report":
+        try:
+            totals = wl.get_minutes_totals(arguments.period,
+                                           employee=arguments.employee,
+                                           start=arguments.start,
+                                           end=arguments.end)
+        except ValueError as error:
+            parser.error(error)
+        for employee, period, minutes in totals:
+            print(json.dumps({"employee": employee,
+                              "period": period,
+                              "minutes": minutes}))
+
+    elif arguments.command == "serve":
+        wl.db.close()
+        server = wl.make_http_server(arguments.host, arguments.port)
+        print("Serving the work log on http://{}:{}/".format(
+            *server.server_address[:2]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+
+    elif arguments.command == "archive":
+        try:
+            moved = wl.archive_tasks(arguments.before)
+        except ValueError as error:
+            parser.error(error)
+        print("Moved {} tasks to {}.".format(moved, arguments.archive))
+
+    elif arguments.command == "compact":
+        converted = wl.convert_to_compact_storage()
+        print("Converted {} tasks to compact storage.".format(converted))
+
+    elif arguments.command == "import":
+        start_time = perf_counter()
+        added, skipped = wl.import_tasks(arguments.file_name)
+        elapsed = perf_counter() - start_time
+
+        print("Added {} tasks ({} skipped) in {:.2f} seconds.".format(
+            added, skipped, elapsed))
+        print("That's {:.0f} rows per second.".format(
+            (added + skipped) / elapsed if elapsed else 0))
 
+    else:
+        wl.enable_query_cache()
         keep_going = True
 
         while keep_going:
@@ -901,8 +3972,8 @@ if __name__ == "__main__":
                         employee_number = wl.ask_for_input()
 
                     wl.clear_screen()
-                    tasks = wl.get_tasks_for_employee(employee_number)
-                    wl.show_report_for_tasks(tasks)
+                    wl.show_paged_report_for_tasks(
+                        partial(wl.get_tasks_for_employee, employee_number))
                     print("Press Enter/Return to continue.")
                     input()
 
@@ -919,8 +3990,8 @@ if __name__ == "__main__":
                         date_number = wl.ask_for_input()
 
                     wl.clear_screen()
-                    tasks = wl.get_tasks_for_date(date_number)
-                    wl.show_report_for_tasks(tasks)
+                    wl.show_paged_report_for_tasks(
+                        partial(wl.get_tasks_for_date, date_number))
                     print("Press Enter/Return to continue.")
                     input()
 
@@ -936,8 +4007,8 @@ if __name__ == "__main__":
                         time_number = wl.ask_for_input()
 
                     wl.clear_screen()
-                    tasks = wl.get_tasks_for_time(time_number)
-                    wl.show_report_for_tasks(tasks)
+                    wl.show_paged_report_for_tasks(
+                        partial(wl.get_tasks_for_time, time_number))
 
                     print("Press Enter/Return to continue.")
                     input()
@@ -948,17 +4019,38 @@ if __name__ == "__main__":
                     wl.display_search_prompt()
                     search_term = wl.ask_for_input()
 
-                    tasks = wl.get_tasks_by_search(search_term)
-                    if len(tasks) == 0:
+                    if not wl.get_tasks_by_search(search_term, limit=1):
                         print("No tasks matched your search term. Try again.")
                         print()
                         print("Press Enter/Return to continue.")
                         input()
                     else:
-                        wl.show_report_for_tasks(tasks)
+                        wl.show_paged_report_for_tasks(
+                            partial(wl.get_tasks_by_search, search_term),
+                            by_position=True)
                         print("Press Enter/Return to continue.")
                         input()
 
+                # Lookup by date range
+                elif lookup_type == "5":
+                    date_range = []
+                    for which_date in ("start", "end"):
+                        wl.clear_screen()
+                        wl.display_date_range_prompt(which_date)
+                        date = wl.ask_for_input()
+                        while not wl.validate_date(date):
+                            wl.clear_screen()
+                            print("That was not a valid date. Try again.")
+                            wl.display_date_range_prompt(which_date)
+                            date = wl.ask_for_input()
+                        date_range.append(date)
+
+                    wl.clear_screen()
+                    wl.show_paged_report_for_tasks(
+                        partial(wl.get_tasks_between, *date_range))
+                    print("Press Enter/Return to continue.")
+                    input()
+
                 else:
                     # This should never occur.
                     wl.clear_screen()
@@ -967,6 +4059,45 @@ if __name__ == "__main__":
                     print("Press Enter/Return to continue.")
                     input()
 
+            # Show time totals
+            elif check_input == "3":
+                wl.clear_screen()
+                wl.display_totals_period_prompt()
+                period_number = wl.ask_for_input()
+                while not wl.validate_totals_period(period_number):
+                    wl.clear_screen()
+                    print("That wasn't a valid option. Try again.")
+                    wl.display_totals_period_prompt()
+                    period_number = wl.ask_for_input()
+                period = {"1": "day", "2": "week", "3": "month"}.get(
+                    period_number)
+
+                date_range = []
+                for which_date in ("start", "end"):
+                    wl.clear_screen()
+                    wl.display_optional_date_prompt(which_date)
+                    date = wl.ask_for_input()
+                    while not wl.validate_optional_date(date):
+                        wl.clear_screen()
+                        print("That wasn't a valid date. Try again.")
+                        wl.display_optional_date_prompt(which_date)
+                        date = wl.ask_for_input()
+                    date_range.append(date or None)
+
+                wl.clear_screen()
+                start, end = date_range
+                wl.write_output(wl.format_totals_table(
+                    wl.get_minutes_totals(period, start=start, end=end)))
+                print("Press Enter/Return to continue.")
+                input()
+
+            # Reload the read replica
+            elif check_input == "5":
+                wl.clear_screen()
+                wl.refresh_replica()
+                print("Reloaded the database. Press Enter/Return to continue.")
+                input()
+
             # Quit
             else:
                 wl.clear_screen()